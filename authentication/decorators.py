@@ -0,0 +1,15 @@
+from functools import wraps
+
+
+def async_user(view):
+    """Resolve ``request.user`` once for an async view.
+
+    ``login_required`` loads the user through ``request.auser()``, but the
+    template context processors read the lazy ``request.user`` in the render
+    thread, which would load it a second time.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        return await view(request, *args, **kwargs)
+    return wrapper
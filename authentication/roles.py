@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.cache import cache
+
+TEACHER = 'Teacher'
+STUDENT = 'Student'
+
+
+def _cache_key(user_id):
+    return f'auth:groups:{user_id}'
+
+
+def get_group_names(user):
+    """Return the names of the user's groups, resolved at most once per request.
+
+    The result is memoized on the user object (which lives for one request) and
+    shared across requests through the cache until the user's groups change.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    try:
+        return user._group_names
+    except AttributeError:
+        pass
+    names = cache.get(_cache_key(user.pk))
+    if names is None:
+        names = list(user.groups.values_list('name', flat=True))
+        cache.set(_cache_key(user.pk), names, settings.ROLE_CACHE_TIMEOUT)
+    user._group_names = frozenset(names)
+    return user._group_names
+
+
+async def aget_group_names(user):
+    """Async counterpart of get_group_names, sharing its memo and cache entry."""
+    if not user.is_authenticated:
+        return frozenset()
+    try:
+        return user._group_names
+    except AttributeError:
+        pass
+    names = await cache.aget(_cache_key(user.pk))
+    if names is None:
+        names = [name async for name in user.groups.values_list('name', flat=True)]
+        await cache.aset(_cache_key(user.pk), names, settings.ROLE_CACHE_TIMEOUT)
+    user._group_names = frozenset(names)
+    return user._group_names
+
+
+def get_role(user):
+    names = get_group_names(user)
+    if TEACHER in names:
+        return TEACHER
+    return STUDENT if STUDENT in names else None
+
+
+def is_teacher(user):
+    return TEACHER in get_group_names(user)
+
+
+def is_student(user):
+    return STUDENT in get_group_names(user)
+
+
+async def ais_teacher(user):
+    return TEACHER in await aget_group_names(user)
+
+
+def invalidate_roles(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
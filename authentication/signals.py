@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+from .roles import invalidate_roles
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    # Guards against a stale entry left behind for a reused primary key
+    if created:
+        invalidate_roles(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.groups.add/remove/clear(): instance is the user
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_roles(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # group.user_set.add/remove(): pk_set holds the affected users
+        invalidate_roles(*pk_set)
+    elif action == 'pre_clear':
+        # group.user_set.clear(): the members are gone by post_clear
+        invalidate_roles(*instance.user_set.values_list('pk', flat=True))
@@ -1,3 +1,33 @@
+from django.contrib.auth.models import AnonymousUser, Group, User
 from django.test import TestCase
+from .roles import get_role, is_student, is_teacher
 
-# Create your tests here.
+class RoleResolutionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user')
+        self.user.groups.add(Group.objects.get(name='Student'))
+
+    def test_resolved_once_per_request(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(is_student(self.user))
+            self.assertFalse(is_teacher(self.user))
+
+    def test_shared_across_requests(self):
+        is_student(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_role(self._fresh()), 'Student')
+
+    def test_group_change_invalidates(self):
+        is_student(self.user)
+        Group.objects.get(name='Teacher').user_set.add(self.user)
+        self.assertEqual(get_role(self._fresh()), 'Teacher')
+        self.user.groups.clear()
+        self.assertIsNone(get_role(self._fresh()))
+
+    def test_anonymous_user_has_no_role(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_role(AnonymousUser()))
+
+    def _fresh(self):
+        # A new instance, like the one loaded for the next request
+        return User(pk=self.user.pk, username=self.user.username)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Course, CourseMaterial
+from .models import Course, CourseMaterial, MaterialUpload
 
 admin.site.register(Course)
 admin.site.register(CourseMaterial)
+admin.site.register(MaterialUpload)
@@ -0,0 +1,51 @@
+"""Reference counting and garbage collection for course material blobs.
+
+Materials are stored by content (see ContentAddressedStorage), so several
+CourseMaterial rows can share one file. MaterialBlob counts the rows per
+file; signals keep the count in step with material saves and deletes.
+
+A blob whose count drops to zero is not deleted on the spot: the storage may
+just have handed its name to an upload of the same content whose row isn't
+saved yet. Like git's object pruning, saves freshen an existing blob's
+mtime, and collect_blobs() only deletes unreferenced blobs whose file hasn't
+been touched for MATERIAL_BLOB_GRACE seconds.
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import CourseMaterial, MaterialBlob
+
+
+def retain_blob(name):
+    MaterialBlob.objects.get_or_create(name=name)
+    MaterialBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release_blob(name):
+    MaterialBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+
+
+def collect_blobs(grace=None):
+    """Delete blobs unreferenced for longer than ``grace`` seconds; returns how many."""
+    grace = settings.MATERIAL_BLOB_GRACE if grace is None else grace
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    storage = CourseMaterial._meta.get_field('file').storage
+    collected = 0
+    for name in MaterialBlob.objects.filter(refcount=0).values_list('name', flat=True):
+        with transaction.atomic():
+            # Re-checked under the row lock in case an upload has just retained it again
+            blob = MaterialBlob.objects.select_for_update().filter(name=name, refcount=0).first()
+            if blob is None:
+                continue
+            try:
+                if storage.get_modified_time(name) > cutoff:
+                    continue
+            except FileNotFoundError:
+                pass
+            storage.delete(name)
+            blob.delete()
+            collected += 1
+    return collected
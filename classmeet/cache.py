@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import cache
+from .models import Course
+
+CATALOG_VERSION_KEY = 'classmeet:catalog_version'
+
+
+def _catalog_key(teacher_id, version):
+    # Any course change can move it between catalogs, so every catalog key embeds
+    # a shared version that a single increment invalidates.
+    return f'classmeet:catalog:{teacher_id or "all"}:{version}'
+
+
+def _materials_key(course_id):
+    return f'classmeet:materials:{course_id}'
+
+
+def get_course_catalog(teacher=None):
+    """Courses shown on the dashboard: the teacher's own, or every course."""
+    version = cache.get_or_set(CATALOG_VERSION_KEY, 1, timeout=None)
+    key = _catalog_key(teacher.pk if teacher else None, version)
+    courses = cache.get(key)
+    if courses is None:
+        courses = Course.objects.select_related('teacher')
+        if teacher:
+            courses = courses.filter(teacher=teacher)
+        courses = list(courses)
+        cache.set(key, courses, settings.COURSE_CACHE_TIMEOUT)
+    return courses
+
+
+async def aget_course_catalog(teacher=None):
+    version = await cache.aget_or_set(CATALOG_VERSION_KEY, 1, timeout=None)
+    key = _catalog_key(teacher.pk if teacher else None, version)
+    courses = await cache.aget(key)
+    if courses is None:
+        courses = Course.objects.select_related('teacher')
+        if teacher:
+            courses = courses.filter(teacher=teacher)
+        courses = [course async for course in courses]
+        await cache.aset(key, courses, settings.COURSE_CACHE_TIMEOUT)
+    return courses
+
+
+def get_course_materials(course):
+    key = _materials_key(course.pk)
+    materials = cache.get(key)
+    if materials is None:
+        materials = list(course.materials.all())
+        cache.set(key, materials, settings.COURSE_CACHE_TIMEOUT)
+    return materials
+
+
+async def aget_course_materials(course):
+    key = _materials_key(course.pk)
+    materials = await cache.aget(key)
+    if materials is None:
+        materials = [material async for material in course.materials.all()]
+        await cache.aset(key, materials, settings.COURSE_CACHE_TIMEOUT)
+    return materials
+
+
+def invalidate_catalog():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 2, timeout=None)
+
+
+def invalidate_materials(course_id):
+    cache.delete(_materials_key(course_id))
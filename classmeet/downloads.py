@@ -0,0 +1,157 @@
+"""Delivery of course material files.
+
+Files are streamed in CHUNK_SIZE pieces with single-range ``Range`` requests,
+``If-Range`` and ETag/Last-Modified revalidation, so video players can seek
+and interrupted downloads resume. How the bytes leave the process depends on
+the server:
+
+- with MATERIAL_ACCEL_REDIRECT set, nginx sends the file itself (and handles
+  ranges) from an ``internal`` location; Django only checks access;
+- under WSGI, whole files go through ``FileResponse`` so the server can use
+  ``wsgi.file_wrapper`` (sendfile);
+- under ASGI, the body is an async iterator reading chunks in a thread. Django
+  buffers synchronous iterators completely before sending them over ASGI, so a
+  plain ``FileResponse`` would load the whole video into memory.
+"""
+
+import asyncio
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+# Matches the ASGI handler's body message size
+CHUNK_SIZE = 64 * 1024
+
+_range_re = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """Resolve a ``Range`` header against a file of ``size`` bytes.
+
+    Returns an inclusive ``(start, end)`` pair, ``None`` to send the whole file
+    (no header, or one we don't support such as multiple ranges) or ``False``
+    when the range can't be satisfied.
+    """
+    match = _range_re.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the final ``last`` bytes
+        if int(last) == 0 or size == 0:
+            return False
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return False
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def _if_range_matches(request, etag, last_modified):
+    # A Range is only honoured if the client's copy is still the current file
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def _aread(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def _empty():
+    return
+    yield
+
+
+def file_response(request, fieldfile, as_attachment=False, filename=None):
+    """Respond to a GET/HEAD for ``fieldfile`` after access has been checked.
+
+    ``filename`` is offered to the browser instead of the stored file's name.
+    """
+    filename = filename or os.path.basename(fieldfile.name)
+    try:
+        path = fieldfile.path
+    except NotImplementedError:
+        # Remote storage serves its own ranges
+        return redirect(fieldfile.url)
+
+    if settings.MATERIAL_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response['X-Accel-Redirect'] = settings.MATERIAL_ACCEL_REDIRECT.rstrip('/') + '/' + quote(fieldfile.name)
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('Material file is missing.')
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = None
+        if _if_range_matches(request, etag, last_modified):
+            byte_range = parse_range(request.headers.get('Range'), size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range is None and not isinstance(request, ASGIRequest) and request.method == 'GET':
+            response = FileResponse(open(path, 'rb'), as_attachment=as_attachment, filename=filename)
+        else:
+            start, end = byte_range or (0, size - 1)
+            length = max(end - start + 1, 0)
+            if request.method == 'HEAD':
+                content = _empty() if isinstance(request, ASGIRequest) else []
+            elif isinstance(request, ASGIRequest):
+                content = _aread(path, start, length)
+            else:
+                content = _read(path, start, length)
+            response = StreamingHttpResponse(
+                content, status=206 if byte_range else 200,
+                content_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            )
+            response['Content-Length'] = str(length)
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+            if byte_range:
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Browsers may keep a copy but must revalidate it, so access checks still apply
+    response['Cache-Control'] = 'private, no-cache'
+    return response
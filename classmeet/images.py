@@ -0,0 +1,136 @@
+"""Resized course thumbnails and PDF material previews.
+
+Course thumbnails are rendered as WebP and JPEG at each of
+COURSE_THUMBNAIL_WIDTHS (never wider than the original) and the dashboard
+picks one through ``srcset``. PDF materials get a WebP preview of their first
+page, which needs the optional ``pypdfium2`` package.
+
+Both run in Celery tasks queued when a course or material is saved (see
+classmeet.signals), and from ``manage.py backfill_images``. Output names are
+derived from the source file's name, so a rerun finds what already exists and
+only renders what is missing.
+"""
+
+import logging
+import os
+import posixpath
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from .cache import invalidate_catalog, invalidate_materials
+from .models import Course, CourseMaterial
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # pragma: no cover - optional dependency
+    pdfium = None
+
+logger = logging.getLogger(__name__)
+
+# Pillow format and save options per variant type
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+PREVIEW_WIDTH = 480
+
+
+def variant_name(source, width, extension):
+    return f'{os.path.splitext(source)[0]}.w{width}.{extension}'
+
+
+def _encode(image, extension):
+    format, options = FORMATS[extension]
+    if format == 'JPEG' and image.mode != 'RGB':
+        # Flatten transparency onto white rather than black
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _save(storage, name, image, extension):
+    if not storage.exists(name):
+        storage.save(name, _encode(image, extension))
+
+
+def render_course_thumbnail(course):
+    """Create the course's missing thumbnail variants and record them on the row.
+
+    Returns the recorded ``{'source': name, 'webp': [[width, name], ...],
+    'jpeg': [...]}``, or ``{}`` if the course has no usable thumbnail.
+    """
+    if not course.thumbnail:
+        variants = {}
+    elif course.thumbnail_variants.get('source') == course.thumbnail.name and all(
+        course.thumbnail.storage.exists(name) for extension in FORMATS
+        for _, name in course.thumbnail_variants.get(extension, [])
+    ):
+        return course.thumbnail_variants
+    else:
+        variants = _render_thumbnail(course.thumbnail)
+
+    if variants != course.thumbnail_variants:
+        # update() rather than save(): saving would queue this task again
+        Course.objects.filter(pk=course.pk).update(thumbnail_variants=variants)
+        course.thumbnail_variants = variants
+        invalidate_catalog()
+    return variants
+
+
+def _render_thumbnail(fieldfile):
+    storage = fieldfile.storage
+    try:
+        with storage.open(fieldfile.name, 'rb') as f, Image.open(f) as original:
+            largest = max(settings.COURSE_THUMBNAIL_WIDTHS)
+            # JPEG sources can be decoded at a fraction of their size
+            original.draft('RGB', (largest, largest * original.height // original.width))
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except (OSError, Image.DecompressionBombError):
+        logger.warning('Could not read course thumbnail %s', fieldfile.name, exc_info=True)
+        return {}
+
+    # Widths past the original's add bytes without detail; its own width stands in for them
+    widths = sorted({min(width, image.width) for width in settings.COURSE_THUMBNAIL_WIDTHS})
+    variants = {'source': fieldfile.name}
+    for width in widths:
+        resized = image if width == image.width else image.resize(
+            (width, max(1, round(image.height * width / image.width))), Image.LANCZOS,
+        )
+        for extension in FORMATS:
+            name = variant_name(fieldfile.name, width, extension)
+            _save(storage, name, resized, extension)
+            variants.setdefault(extension, []).append([width, name])
+    return variants
+
+
+def render_material_preview(material):
+    """Render the first page of a PDF material; returns the preview's name or None."""
+    if pdfium is None or not material.file or not material.file.name.lower().endswith('.pdf'):
+        return None
+    # Materials share content-addressed files, and so share previews
+    stem = os.path.splitext(posixpath.basename(material.file.name))[0]
+    name = f'material_previews/{stem}.w{PREVIEW_WIDTH}.webp'
+    storage = CourseMaterial._meta.get_field('preview').storage
+    if not storage.exists(name):
+        try:
+            document = pdfium.PdfDocument(material.file.path)
+            try:
+                page = document[0]
+                image = page.render(scale=PREVIEW_WIDTH / page.get_width()).to_pil()
+            finally:
+                document.close()
+        except (pdfium.PdfiumError, IndexError, OSError):
+            logger.warning('Could not render a preview of material %s', material.pk, exc_info=True)
+            return None
+        _save(storage, name, image, 'webp')
+    if material.preview.name != name:
+        CourseMaterial.objects.filter(pk=material.pk).update(preview=name)
+        material.preview.name = name
+        invalidate_materials(material.course_id)
+    return name
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from classmeet.images import pdfium, render_course_thumbnail, render_material_preview
+from classmeet.models import Course, CourseMaterial
+from classmeet.tasks import generate_course_thumbnails, generate_material_preview
+
+
+class Command(BaseCommand):
+    help = (
+        'Create missing course thumbnail variants and PDF material previews. Safe to '
+        'rerun: existing files are reused.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='store_true', help='Queue Celery tasks instead of rendering here')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.exclude(thumbnail='').exclude(thumbnail__isnull=True)
+        materials = CourseMaterial.objects.filter(file__iendswith='.pdf')
+        if pdfium is None:
+            self.stderr.write('pypdfium2 is not installed; skipping PDF previews.')
+            materials = materials.none()
+
+        if options['queue']:
+            for course_id in courses.values_list('pk', flat=True):
+                generate_course_thumbnails.delay(course_id)
+            for material_id in materials.values_list('pk', flat=True):
+                generate_material_preview.delay(material_id)
+            self.stdout.write('Queued thumbnails and previews.')
+            return
+
+        thumbnails = sum(bool(render_course_thumbnail(course)) for course in courses.iterator())
+        previews = sum(bool(render_material_preview(material)) for material in materials.iterator())
+        self.stdout.write(f'{thumbnails} course thumbnails and {previews} material previews up to date.')
@@ -0,0 +1,37 @@
+import os
+import re
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from classmeet.blobs import collect_blobs
+from classmeet.models import CourseMaterial
+
+# Names written by ContentAddressedStorage
+BLOB_NAME = re.compile(r'/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[^/]*)?$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Move course materials stored before content-addressed storage into shared '
+        'blobs, then delete the old copies.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-old', action='store_true',
+                            help='Leave the old files to the hourly collect_material_blobs task')
+
+    def handle(self, *args, **options):
+        storage = CourseMaterial._meta.get_field('file').storage
+        moved = missing = 0
+        for material in CourseMaterial.objects.exclude(file='').iterator():
+            if BLOB_NAME.search(material.file.name):
+                continue
+            if not storage.exists(material.file.name):
+                missing += 1
+                self.stderr.write(f'Material {material.pk}: {material.file.name} is missing, skipped')
+                continue
+            with storage.open(material.file.name, 'rb') as f:
+                # Saving releases the old name and retains the blob (see classmeet.signals)
+                material.file.save(os.path.basename(material.file.name), File(f))
+            moved += 1
+        collected = 0 if options['keep_old'] else collect_blobs()
+        self.stdout.write(f'{moved} materials moved to blobs, {collected} unreferenced files deleted, {missing} missing')
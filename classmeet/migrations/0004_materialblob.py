@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:45
+
+import classmeet.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_files(apps, schema_editor):
+    # Materials saved before reference counting each hold a reference to their file
+    CourseMaterial = apps.get_model('classmeet', 'CourseMaterial')
+    MaterialBlob = apps.get_model('classmeet', 'MaterialBlob')
+    MaterialBlob.objects.bulk_create([
+        MaterialBlob(name=row['file'], refcount=row['refs'])
+        for row in CourseMaterial.objects.exclude(file='').values('file').annotate(refs=Count('id'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classmeet', '0003_materialupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('refcount', models.PositiveIntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='coursematerial',
+            name='file',
+            field=models.FileField(storage=classmeet.storage.material_storage, upload_to='course_materials/'),
+        ),
+        migrations.RunPython(count_existing_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classmeet', '0004_materialblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='thumbnail_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='coursematerial',
+            name='preview',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='material_previews/'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classmeet', '0005_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materialupload',
+            name='claim',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='materialupload',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
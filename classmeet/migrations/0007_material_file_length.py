@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:05
+
+import classmeet.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classmeet', '0006_materialupload_claim'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coursematerial',
+            name='file',
+            field=models.FileField(max_length=255, storage=classmeet.storage.material_storage, upload_to='course_materials/'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classmeet', '0007_material_file_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materialupload',
+            name='material',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='classmeet.coursematerial'),
+        ),
+    ]
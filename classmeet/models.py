@@ -1,20 +1,76 @@
+import os
+import uuid
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from .storage import material_storage
 
 class Course(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     thumbnail = models.ImageField(upload_to='course_thumbnails/', null=True, blank=True)
+    # Resized copies of the thumbnail, written by classmeet.images
+    thumbnail_variants = models.JSONField(default=dict, blank=True, editable=False)
     teacher = models.ForeignKey(User, on_delete=models.CASCADE)
 
     def __str__(self):
         return self.title
 
+    @property
+    def thumbnail_sources(self):
+        # What the course card's <picture> needs; None until the variants exist
+        variants = self.thumbnail_variants
+        if not self.thumbnail or variants.get('source') != self.thumbnail.name:
+            return None
+        storage = self.thumbnail.storage
+        srcset = {
+            extension: ', '.join(f'{storage.url(name)} {width}w' for width, name in variants[extension])
+            for extension in ('webp', 'jpeg')
+        }
+        srcset['src'] = storage.url(variants['jpeg'][0][1])
+        return srcset
+
 class CourseMaterial(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='materials')
     title = models.CharField(max_length=200)
-    file = models.FileField(upload_to='course_materials/')
+    # Blob names are 87 characters plus an extension of at most 16 (see classmeet.storage)
+    file = models.FileField(upload_to='course_materials/', storage=material_storage, max_length=255)
+    # First page of PDF materials, written by classmeet.images
+    preview = models.ImageField(upload_to='material_previews/', null=True, blank=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.title} ({self.course.title})"
+
+class MaterialBlob(models.Model):
+    # A stored material file and how many CourseMaterial rows point at it; see classmeet.blobs
+    name = models.CharField(max_length=255, primary_key=True)
+    refcount = models.PositiveIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+class MaterialUpload(models.Model):
+    # A course material arriving in chunks; see classmeet.uploads
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='uploads')
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    title = models.CharField(max_length=200)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    # Set while a PATCH is writing a chunk
+    claim = models.UUIDField(null=True, blank=True, editable=False)
+    claimed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Set once complete, so a client retrying the last PATCH is answered until the upload expires
+    material = models.ForeignKey(
+        CourseMaterial, on_delete=models.CASCADE, null=True, blank=True, editable=False, related_name='+',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def part_path(self):
+        return os.path.join(settings.MATERIAL_UPLOAD_DIR, f'{self.id}.part')
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
@@ -0,0 +1,77 @@
+import os
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .blobs import release_blob, retain_blob
+from .cache import invalidate_catalog, invalidate_materials
+from .models import Course, CourseMaterial, MaterialUpload
+from .tasks import generate_course_thumbnails, generate_material_preview
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender, instance, **kwargs):
+    invalidate_catalog()
+    invalidate_materials(instance.pk)
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, **kwargs):
+    if instance.thumbnail and instance.thumbnail.name != instance.thumbnail_variants.get('source'):
+        transaction.on_commit(lambda: generate_course_thumbnails.delay(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=CourseMaterial)
+def course_material_changed(sender, instance, **kwargs):
+    invalidate_materials(instance.course_id)
+
+
+@receiver(pre_save, sender=CourseMaterial)
+def course_material_saving(sender, instance, **kwargs):
+    # Remember which blob an edited material pointed at before
+    instance._previous_file = None
+    if instance.pk:
+        instance._previous_file = (
+            CourseMaterial.objects.filter(pk=instance.pk).values_list('file', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=CourseMaterial)
+def course_material_saved(sender, instance, **kwargs):
+    if instance.file.name != instance._previous_file:
+        if instance.file.name:
+            retain_blob(instance.file.name)
+            if instance.file.name.lower().endswith('.pdf'):
+                transaction.on_commit(lambda: generate_material_preview.delay(instance.pk))
+        if instance._previous_file:
+            release_blob(instance._previous_file)
+
+
+@receiver(post_delete, sender=CourseMaterial)
+def course_material_deleted(sender, instance, **kwargs):
+    # Course deletes cascade here for each of the course's materials
+    if instance.file.name:
+        release_blob(instance.file.name)
+
+
+@receiver(post_save, sender=User)
+def teacher_changed(sender, instance, created, update_fields=None, **kwargs):
+    # The catalog shows teacher names; new users and logins (last_login only) are skipped
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    if Course.objects.filter(teacher=instance).exists():
+        invalidate_catalog()
+
+
+@receiver(post_delete, sender=MaterialUpload)
+def upload_discarded(sender, instance, **kwargs):
+    # Resolved now: the instance's pk is cleared once the delete finishes.
+    # Completed uploads have already been moved into storage.
+    path = instance.part_path
+
+    def remove_part():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    transaction.on_commit(remove_part)
@@ -0,0 +1,127 @@
+// Resumable material uploads against classmeet's tus endpoint (classmeet/uploads.py).
+// Files go up in checksummed chunks; an interrupted upload of the same file resumes
+// from the server's offset instead of starting over.
+const TUS_VERSION = '1.0.0';
+const MAX_RETRIES = 5;
+
+class MaterialUploader {
+    constructor(form) {
+        this.form = form;
+        this.createUrl = form.dataset.uploadUrl;
+        this.successUrl = form.dataset.successUrl;
+        this.chunkSize = parseInt(form.dataset.chunkSize, 10);
+        this.csrfToken = form.querySelector('[name=csrfmiddlewaretoken]').value;
+        this.progress = document.getElementById('upload-progress');
+        this.bar = this.progress.querySelector('.progress-bar');
+        this.error = document.getElementById('upload-error');
+
+        form.addEventListener('submit', (event) => {
+            const file = form.querySelector('input[type=file]').files[0];
+            if (!file) return;
+            event.preventDefault();
+            this.upload(file, form.querySelector('[name=title]').value).catch((err) => {
+                this.error.textContent = err.message;
+                this.error.classList.remove('d-none');
+                this.form.querySelector('[type=submit]').disabled = false;
+            });
+        });
+    }
+
+    headers(extra = {}) {
+        return { 'Tus-Resumable': TUS_VERSION, 'X-CSRFToken': this.csrfToken, ...extra };
+    }
+
+    async upload(file, title) {
+        this.form.querySelector('[type=submit]').disabled = true;
+        this.error.classList.add('d-none');
+        this.progress.classList.remove('d-none');
+
+        const key = ['material-upload', this.createUrl, file.name, file.size, file.lastModified].join(':');
+        let url = localStorage.getItem(key);
+        let offset = url ? await this.currentOffset(url) : null;
+        if (offset === null) {
+            url = await this.create(file, title);
+            localStorage.setItem(key, url);
+            offset = 0;
+        }
+
+        let retries = 0;
+        while (offset < file.size) {
+            this.showProgress(offset, file.size);
+            try {
+                offset = await this.sendChunk(url, file, offset);
+                retries = 0;
+            } catch (err) {
+                if (++retries > MAX_RETRIES) throw err;
+                // Network hiccup: back off, then ask the server how much it kept
+                await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** retries));
+                const current = await this.currentOffset(url).catch(() => null);
+                if (current !== null) offset = current;
+            }
+        }
+        this.showProgress(file.size, file.size);
+        localStorage.removeItem(key);
+        window.location.href = this.successUrl;
+    }
+
+    async create(file, title) {
+        const response = await fetch(this.createUrl, {
+            method: 'POST',
+            headers: this.headers({
+                'Upload-Length': String(file.size),
+                'Upload-Metadata': `filename ${encodeMetadata(file.name)},title ${encodeMetadata(title)}`,
+            }),
+        });
+        if (response.status === 413) throw new Error('This file is too large to upload.');
+        if (response.status !== 201) throw new Error(`Could not start the upload (${response.status}).`);
+        return response.headers.get('Location');
+    }
+
+    async currentOffset(url) {
+        const response = await fetch(url, { method: 'HEAD', headers: this.headers() });
+        return response.ok ? parseInt(response.headers.get('Upload-Offset'), 10) : null;
+    }
+
+    async sendChunk(url, file, offset) {
+        const chunk = file.slice(offset, offset + this.chunkSize);
+        const response = await fetch(url, {
+            method: 'PATCH',
+            headers: this.headers({
+                'Content-Type': 'application/offset+octet-stream',
+                'Upload-Offset': String(offset),
+                'Upload-Checksum': `sha256 ${await sha256(chunk)}`,
+            }),
+            body: chunk,
+        });
+        // 409 (offset moved on) and 460 (checksum mismatch) both carry the offset to resume from
+        if ([204, 409, 460].includes(response.status)) {
+            const next = parseInt(response.headers.get('Upload-Offset'), 10);
+            // A 409 at our own offset means an earlier request is still writing this chunk
+            if (response.status !== 409 || next !== offset) return next;
+        }
+        throw new Error(`Upload failed (${response.status}).`);
+    }
+
+    showProgress(offset, size) {
+        const percent = size ? Math.floor((offset / size) * 100) : 100;
+        this.bar.style.width = `${percent}%`;
+        this.bar.textContent = `${percent}%`;
+    }
+}
+
+function encodeMetadata(value) {
+    return btoa(String.fromCharCode(...new TextEncoder().encode(value)));
+}
+
+async function sha256(blob) {
+    const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return btoa(String.fromCharCode(...new Uint8Array(digest)));
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const form = document.getElementById('material-form');
+    // Without WebCrypto (plain-http origins) the form posts the file in one request
+    if (form && window.crypto && crypto.subtle) {
+        new MaterialUploader(form);
+    }
+});
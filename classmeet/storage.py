@@ -0,0 +1,78 @@
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+# Bytes hashed per read when a file is already on disk
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Kept from the uploaded name so served files get the right type; anything
+# longer or unusual is dropped rather than let through into the file name
+EXTENSION = re.compile(r'\.[a-z0-9]{1,15}')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage that keeps one copy of each distinct content.
+
+    Files are named after the SHA-256 of their bytes
+    (``<upload_to>/ab/cd/abcd...<ext>``), hashed while the upload is written to
+    a staging file, so saving a file that is already stored only costs the
+    hash. Blobs are shared between rows and never modified; reference counts
+    and deletion live in ``classmeet.blobs``.
+    """
+
+    staging_dir = '.staging'
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed, in _save()
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        if not EXTENSION.fullmatch(extension):
+            extension = ''
+        staging = self.path(posixpath.join(directory, self.staging_dir, uuid.uuid4().hex))
+        os.makedirs(os.path.dirname(staging), exist_ok=True)
+
+        digest = hashlib.sha256()
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk (large uploads, assembled chunked uploads): hash it in
+            # place and only move it if the content is new
+            source = content.temporary_file_path()
+            with open(source, 'rb') as f:
+                while block := f.read(HASH_BLOCK_SIZE):
+                    digest.update(block)
+        else:
+            source = None
+            with open(staging, 'wb') as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+
+        sha256 = digest.hexdigest()
+        blob = posixpath.join(directory, sha256[:2], sha256[2:4], sha256 + extension)
+        full_path = self.path(blob)
+        if os.path.exists(full_path):
+            if source is None:
+                os.remove(staging)
+            # Freshen it so garbage collection leaves it alone while the new
+            # reference is being recorded
+            os.utime(full_path)
+            return blob
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if source is not None:
+            file_move_safe(source, staging, allow_overwrite=True)
+        # Concurrent saves of the same content replace each other with identical bytes
+        os.replace(staging, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return blob
+
+
+def material_storage():
+    return ContentAddressedStorage()
@@ -0,0 +1,30 @@
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from .blobs import collect_blobs
+from .images import render_course_thumbnail, render_material_preview
+from .models import Course, CourseMaterial, MaterialUpload
+
+@shared_task
+def expire_material_uploads():
+    # Part files are removed by the post_delete signal
+    cutoff = timezone.now() - timedelta(hours=settings.MATERIAL_UPLOAD_EXPIRY)
+    deleted, _ = MaterialUpload.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+@shared_task
+def collect_material_blobs():
+    return collect_blobs()
+
+@shared_task
+def generate_course_thumbnails(course_id):
+    course = Course.objects.filter(pk=course_id).first()
+    if course is not None:
+        render_course_thumbnail(course)
+
+@shared_task
+def generate_material_preview(material_id):
+    material = CourseMaterial.objects.filter(pk=material_id).first()
+    if material is not None:
+        render_material_preview(material)
@@ -1,3 +1,436 @@
-from django.test import TestCase
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from lms.testing import QueryBudgetMixin
+from .blobs import collect_blobs
+from .cache import get_course_catalog, get_course_materials, invalidate_catalog, invalidate_materials
+from .downloads import CHUNK_SIZE
+from .images import PREVIEW_WIDTH, pdfium, render_course_thumbnail
+from .models import Course, CourseMaterial, MaterialBlob, MaterialUpload
+from .storage import material_storage
+from .tasks import expire_material_uploads
 
-# Create your tests here.
+def temporary_media(add_cleanup, **overrides):
+    """Point MEDIA_ROOT (plus any other ``overrides``) at a new directory until cleanup.
+
+    Pass ``cls.addClassCleanup`` from setUpClass, before ``super()``, to share it with
+    setUpTestData, or ``self.addCleanup`` from setUp to isolate each test.
+    """
+    media_root = tempfile.mkdtemp()
+    add_cleanup(shutil.rmtree, media_root, ignore_errors=True)
+    media = override_settings(MEDIA_ROOT=media_root, **overrides)
+    media.enable()
+    add_cleanup(media.disable)
+    return media_root
+
+def create_user(username, role):
+    user = User.objects.create_user(username=username, first_name=username.title())
+    user.groups.add(Group.objects.get(name=role))
+    return user
+
+class ClassmeetQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = create_user('student', 'Student')
+        for i in range(10):
+            teacher = create_user(f'teacher{i}', 'Teacher')
+            course = Course.objects.create(title=f'Course {i}', description='text', teacher=teacher)
+            for j in range(10):
+                CourseMaterial.objects.create(course=course, title=f'Material {j}', file=f'course_materials/{j}.pdf')
+        cls.course = course
+        cls.teacher = teacher
+
+    def test_student_dashboard(self):
+        self.client.force_login(self.student)
+        self.assertViewWithinBudget(1, reverse('dashboard'))
+        self.assertViewWithinBudget(2, reverse('dashboard'), reset=invalidate_catalog)
+
+    def test_teacher_dashboard(self):
+        self.client.force_login(self.teacher)
+        self.assertViewWithinBudget(1, reverse('dashboard'))
+        self.assertViewWithinBudget(2, reverse('dashboard'), reset=invalidate_catalog)
+
+    def test_course_detail(self):
+        self.client.force_login(self.student)
+        url = reverse('course_detail', args=[self.course.id])
+        self.assertViewWithinBudget(2, url)
+        self.assertViewWithinBudget(3, url, reset=lambda: invalidate_materials(self.course.id))
+
+
+class CourseCacheTests(TestCase):
+    def setUp(self):
+        self.teacher = create_user('teacher', 'Teacher')
+        self.course = Course.objects.create(title='Course', description='text', teacher=self.teacher)
+
+    def test_catalog_is_cached_and_invalidated(self):
+        get_course_catalog()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_course_catalog(), [self.course])
+        other = Course.objects.create(title='Other', description='text', teacher=self.teacher)
+        self.assertEqual(get_course_catalog(teacher=self.teacher), [self.course, other])
+        self.course.delete()
+        self.assertEqual(get_course_catalog(), [other])
+
+    def test_materials_are_cached_and_invalidated(self):
+        self.assertEqual(get_course_materials(self.course), [])
+        material = CourseMaterial.objects.create(course=self.course, title='Slides', file='course_materials/a.pdf')
+        with self.assertNumQueries(1):
+            self.assertEqual(get_course_materials(self.course), [material])
+            self.assertEqual(get_course_materials(self.course), [material])
+        material.delete()
+        self.assertEqual(get_course_materials(self.course), [])
+
+
+class MaterialDownloadTests(TestCase):
+    body = bytes(range(256)) * 1024
+
+    @classmethod
+    def setUpClass(cls):
+        temporary_media(cls.addClassCleanup, MATERIAL_ACCEL_REDIRECT='')
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = create_user('teacher', 'Teacher')
+        cls.student = create_user('student', 'Student')
+        cls.course = Course.objects.create(title='Course', description='text', teacher=cls.teacher)
+        cls.material = CourseMaterial.objects.create(
+            course=cls.course, title='Lecture', file=SimpleUploadedFile('lecture.mp4', cls.body),
+        )
+        cls.url = reverse('download_course_material', args=[cls.material.id])
+
+    def setUp(self):
+        self.client.force_login(self.student)
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertIn('ETag', response)
+
+    def test_ranges(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=1000-1999'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1999/{len(self.body)}')
+        self.assertEqual(b''.join(response.streaming_content), self.body[1000:2000])
+
+        response = self.client.get(self.url, headers={'Range': 'bytes=-100'})
+        self.assertEqual(b''.join(response.streaming_content), self.body[-100:])
+
+        response = self.client.get(self.url, headers={'Range': f'bytes={len(self.body)}-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.body)}')
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 304)
+        # A stale If-Range gets the whole current file instead of a piece of it
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+
+    async def test_asgi_streams_in_chunks(self):
+        await self.async_client.aforce_login(self.student)
+        response = await self.async_client.get(self.url, headers={'Range': 'bytes=10-'})
+        self.assertEqual(response.status_code, 206)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(b''.join(chunks), self.body[10:])
+        self.assertEqual(len(chunks[0]), CHUNK_SIZE)
+
+    def test_access(self):
+        outsider = User.objects.create_user(username='outsider')
+        self.client.force_login(outsider)
+        self.assertRedirects(self.client.get(self.url), reverse('dashboard'), fetch_redirect_response=False)
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(MATERIAL_ACCEL_REDIRECT='/protected-media/')
+    def test_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.material.file.name}')
+        self.assertEqual(response.content, b'')
+
+
+class MaterialUploadTests(TestCase):
+    body = os.urandom(2500)
+
+    @classmethod
+    def setUpClass(cls):
+        temporary_media(cls.addClassCleanup, MATERIAL_UPLOAD_CHUNK_SIZE=1024)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = create_user('teacher', 'Teacher')
+        cls.course = Course.objects.create(title='Course', description='text', teacher=cls.teacher)
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+        # Uploads left unfinished by one test mustn't show up in the next
+        self.settings_override = override_settings(MATERIAL_UPLOAD_DIR=tempfile.mkdtemp(dir=settings.MEDIA_ROOT))
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def post(self, filename=b'lecture.mp4', title=b'Lecture', size=None):
+        metadata = f'filename {base64.b64encode(filename).decode()},title {base64.b64encode(title).decode()}'
+        return self.client.post(
+            reverse('create_material_upload', args=[self.course.id]),
+            headers={'Upload-Length': str(size or len(self.body)), 'Upload-Metadata': metadata},
+        )
+
+    def create(self, size=None):
+        response = self.post(size=size)
+        self.assertEqual(response.status_code, 201)
+        return response['Location']
+
+    def patch(self, url, offset, chunk, digest=None):
+        digest = digest or hashlib.sha256(chunk).digest()
+        return self.client.generic(
+            'PATCH', url, chunk, content_type='application/offset+octet-stream',
+            headers={'Upload-Offset': str(offset), 'Upload-Checksum': f'sha256 {base64.b64encode(digest).decode()}'},
+        )
+
+    def test_chunked_upload_creates_material(self):
+        url = self.create()
+        for offset in range(0, len(self.body), 1024):
+            response = self.patch(url, offset, self.body[offset:offset + 1024])
+            self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], str(len(self.body)))
+        material = CourseMaterial.objects.get(course=self.course)
+        self.assertEqual(material.title, 'Lecture')
+        with material.file.open('rb') as f:
+            self.assertEqual(f.read(), self.body)
+        self.assertEqual(MaterialUpload.objects.get().material, material)
+        self.assertEqual(os.listdir(settings.MATERIAL_UPLOAD_DIR), [])
+
+        # A client that lost the last response and resends the chunk is told it's done
+        response = self.patch(url, 2048, self.body[2048:])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], str(len(self.body)))
+        self.assertEqual(response['Location'], reverse('download_course_material', args=[material.id]))
+        self.assertEqual(CourseMaterial.objects.count(), 1)
+
+    def test_resume_after_interruption(self):
+        url = self.create()
+        self.patch(url, 0, self.body[:1024])
+        # A body cut short fails its checksum and nothing of it is kept
+        response = self.patch(url, 1024, self.body[1024:1500], digest=hashlib.sha256(self.body[1024:2048]).digest())
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '1024')
+        # Resending from a stale offset is refused with the offset to continue from
+        response = self.patch(url, 0, self.body[:1024])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '1024')
+        self.patch(url, 1024, self.body[1024:2048])
+        self.patch(url, 2048, self.body[2048:])
+        with CourseMaterial.objects.get(course=self.course).file.open('rb') as f:
+            self.assertEqual(f.read(), self.body)
+
+    def test_chunk_in_progress_is_not_overwritten(self):
+        url = self.create()
+        MaterialUpload.objects.update(claim=uuid.uuid4(), claimed_at=timezone.now())
+        response = self.patch(url, 0, self.body[:1024])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '0')
+        # A claim left behind by a request that died is taken over
+        MaterialUpload.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.patch(url, 0, self.body[:1024]).status_code, 204)
+        self.assertEqual(MaterialUpload.objects.get().claim, None)
+
+    def test_limits_and_ownership(self):
+        with self.settings(MATERIAL_UPLOAD_MAX_SIZE=100):
+            response = self.client.post(
+                reverse('create_material_upload', args=[self.course.id]),
+                headers={'Upload-Length': '101', 'Upload-Metadata': f'filename {base64.b64encode(b"a").decode()}'},
+            )
+            self.assertEqual(response.status_code, 413)
+        # Metadata that wouldn't fit the material's columns
+        self.assertEqual(self.post(filename=b'a' * 252 + b'.mp4').status_code, 400)
+        self.assertEqual(self.post(title=b'a' * 201).status_code, 400)
+        self.assertEqual(self.post(filename=b'dir/', title=b'').status_code, 400)
+        self.assertFalse(MaterialUpload.objects.exists())
+        url = self.create()
+        self.assertEqual(self.patch(url, 0, self.body[:2048]).status_code, 413)
+        self.client.force_login(create_user('other', 'Teacher'))
+        self.assertEqual(self.client.head(url).status_code, 404)
+
+    def test_expired_uploads_are_discarded(self):
+        self.create()
+        upload = MaterialUpload.objects.get()
+        MaterialUpload.objects.update(created_at=timezone.now() - timedelta(days=2))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_material_uploads(), 1)
+        self.assertFalse(os.path.exists(upload.part_path))
+
+
+class ContentAddressedStorageTests(TestCase):
+    slides = b'%PDF-1.7 slides' * 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = create_user('teacher', 'Teacher')
+        cls.courses = [
+            Course.objects.create(title=f'Course {i}', description='text', teacher=cls.teacher) for i in range(2)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+        temporary_media(self.addCleanup)
+
+    def add_material(self, course, name, content):
+        self.client.post(reverse('add_course_material', args=[course.id]), {
+            'title': name, 'file': SimpleUploadedFile(name, content),
+        })
+        return CourseMaterial.objects.get(course=course, title=name)
+
+    def blob_files(self):
+        root = os.path.join(settings.MEDIA_ROOT, 'course_materials')
+        return [
+            name for directory, _, files in os.walk(root) if '.staging' not in directory for name in files
+        ]
+
+    def test_identical_uploads_share_a_blob(self):
+        first = self.add_material(self.courses[0], 'Slides.PDF', self.slides)
+        second = self.add_material(self.courses[1], 'Copy.pdf', self.slides)
+        digest = hashlib.sha256(self.slides).hexdigest()
+        self.assertEqual(first.file.name, f'course_materials/{digest[:2]}/{digest[2:4]}/{digest}.pdf')
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(self.blob_files(), [f'{digest}.pdf'])
+        self.assertEqual(MaterialBlob.objects.get(name=first.file.name).refcount, 2)
+
+        other = self.add_material(self.courses[1], 'Notes.pdf', b'other')
+        self.assertEqual(len(self.blob_files()), 2)
+        self.assertNotEqual(other.file.name, first.file.name)
+
+    def test_blob_extensions_are_bounded(self):
+        storage = material_storage()
+        digest = hashlib.sha256(b'notes').hexdigest()
+        for filename, extension in [('Notes.PDF', '.pdf'), ('notes.' + 'x' * 300, ''), ('notes.p df', ''), ('notes', '')]:
+            name = storage.save(f'course_materials/{filename}', ContentFile(b'notes'))
+            self.assertEqual(name, f'course_materials/{digest[:2]}/{digest[2:4]}/{digest}{extension}')
+
+    def test_last_reference_releases_the_blob(self):
+        material = self.add_material(self.courses[0], 'Slides.pdf', self.slides)
+        self.add_material(self.courses[1], 'Slides.pdf', self.slides)
+        name = material.file.name
+
+        self.client.post(reverse('delete_course_material', args=[material.id]))
+        self.assertEqual(collect_blobs(grace=0), 0)
+        self.client.post(reverse('delete_course', args=[self.courses[1].id]))
+        blob = MaterialBlob.objects.get(name=name)
+        self.assertEqual(blob.refcount, 0)
+
+        # Within the grace period the blob survives, and re-uploading the content revives it
+        self.assertEqual(collect_blobs(), 0)
+        self.add_material(self.courses[0], 'Again.pdf', self.slides)
+        self.assertEqual(MaterialBlob.objects.get(name=name).refcount, 1)
+
+        CourseMaterial.objects.all().delete()
+        os.utime(os.path.join(settings.MEDIA_ROOT, name), (0, 0))
+        self.assertEqual(collect_blobs(), 1)
+        self.assertEqual(self.blob_files(), [])
+        self.assertFalse(MaterialBlob.objects.exists())
+
+    def test_dedupe_existing_materials(self):
+        storage = CourseMaterial._meta.get_field('file').storage
+        for course in self.courses:
+            legacy = f'course_materials/legacy-{course.id}.pdf'
+            FileSystemStorage().save(legacy, ContentFile(self.slides))
+            CourseMaterial.objects.create(course=course, title='Slides', file=legacy)
+            os.utime(storage.path(legacy), (0, 0))
+        call_command('dedupe_materials', stdout=StringIO())
+        names = set(CourseMaterial.objects.values_list('file', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(self.blob_files(), [os.path.basename(names.pop())])
+
+
+def image_file(name, size, format='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'navy').save(buffer, format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ImagePipelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = create_user('teacher', 'Teacher')
+
+    def setUp(self):
+        temporary_media(self.addCleanup, COURSE_THUMBNAIL_WIDTHS=[320, 640, 960])
+
+    def create_course(self, thumbnail):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(title='Course', description='text', teacher=self.teacher, thumbnail=thumbnail)
+        course.refresh_from_db()
+        return course
+
+    def test_thumbnail_variants(self):
+        course = self.create_course(image_file('photo.jpg', (2400, 1600)))
+        self.assertEqual([width for width, _ in course.thumbnail_variants['webp']], [320, 640, 960])
+        storage = course.thumbnail.storage
+        for extension, format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+            for width, name in course.thumbnail_variants[extension]:
+                with storage.open(name) as f, Image.open(f) as variant:
+                    self.assertEqual((variant.format, variant.size), (format, (width, round(width * 2 / 3))))
+
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, f'{storage.url(course.thumbnail_variants["webp"][0][1])} 320w')
+
+    def test_rerun_is_idempotent(self):
+        course = self.create_course(image_file('photo.png', (500, 300), 'PNG'))
+        # Never upscaled: the original width replaces the larger ones
+        self.assertEqual([width for width, _ in course.thumbnail_variants['jpeg']], [320, 500])
+        with self.assertNumQueries(0):
+            self.assertEqual(render_course_thumbnail(course), course.thumbnail_variants)
+
+        # A missing variant is rendered again without touching the others
+        storage = course.thumbnail.storage
+        storage.delete(course.thumbnail_variants['webp'][0][1])
+        call_command('backfill_images', stdout=StringIO(), stderr=StringIO())
+        self.assertTrue(storage.exists(course.thumbnail_variants['webp'][0][1]))
+
+    def test_placeholder_without_thumbnail(self):
+        course = self.create_course(None)
+        self.assertEqual(course.thumbnail_variants, {})
+        self.client.force_login(self.teacher)
+        self.assertContains(self.client.get(reverse('dashboard')), 'classmeet/img/course-placeholder.svg')
+
+    @skipUnless(pdfium, 'pypdfium2 is not installed')
+    def test_pdf_preview(self):
+        course = self.create_course(None)
+        buffer = BytesIO()
+        Image.new('RGB', (850, 1100), 'white').save(buffer, 'PDF')
+        with self.captureOnCommitCallbacks(execute=True):
+            material = CourseMaterial.objects.create(
+                course=course, title='Slides', file=SimpleUploadedFile('slides.pdf', buffer.getvalue()),
+            )
+        material.refresh_from_db()
+        with material.preview.open() as f, Image.open(f) as preview:
+            self.assertEqual((preview.format, preview.width), ('WEBP', PREVIEW_WIDTH))
+
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('course_material_preview', args=[material.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(self.client.get(reverse('course_detail', args=[course.id])),
+                            reverse('course_material_preview', args=[material.id]))
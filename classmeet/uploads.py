@@ -0,0 +1,145 @@
+"""Resumable course material uploads, following the tus 1.0 protocol.
+
+A teacher's browser creates an upload (``POST`` with ``Upload-Length`` and
+``Upload-Metadata``), then sends the file as a series of ``PATCH`` requests,
+each carrying ``Upload-Offset`` and an ``Upload-Checksum`` of its chunk.
+Chunks are streamed straight into a part file under MATERIAL_UPLOAD_DIR and
+hashed on the way, so memory use doesn't depend on the file or chunk size. A
+chunk whose checksum doesn't match is cut off again. After a dropped
+connection the client asks for the current offset with ``HEAD`` and carries
+on from there.
+
+No transaction or row lock is held while a chunk arrives, since that takes as
+long as the client's network does. Instead a PATCH claims the upload with a
+conditional UPDATE on its offset, writes, then advances the offset with
+another conditional UPDATE that only succeeds while the claim is still its
+own. A claim older than MATERIAL_UPLOAD_CLAIM_TIMEOUT seconds (a worker that
+died mid-chunk) can be taken over.
+
+When the last byte arrives the part file is moved (not copied) into the
+material storage and the CourseMaterial row is created. The upload row is
+kept, pointing at the material, so a client that lost the response to its
+last PATCH and sends it again is told the upload is complete.
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+from .models import CourseMaterial, MaterialUpload
+
+TUS_VERSION = '1.0.0'
+TUS_EXTENSIONS = 'creation,checksum,termination'
+CHECKSUM_ALGORITHMS = ('sha256', 'sha1', 'md5')
+
+# Bytes read from the request per write
+COPY_SIZE = 64 * 1024
+
+
+def parse_metadata(header):
+    """Decode ``Upload-Metadata`` (``key base64value`` pairs, comma-separated)."""
+    metadata = {}
+    for pair in filter(None, (header or '').split(',')):
+        key, _, value = pair.strip().partition(' ')
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValueError(f'Bad Upload-Metadata value for {key!r}.')
+    return metadata
+
+
+def parse_checksum(header):
+    """Split ``Upload-Checksum`` into ``(algorithm, digest bytes)``."""
+    algorithm, _, value = (header or '').partition(' ')
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError('Upload-Checksum must name one of: ' + ', '.join(CHECKSUM_ALGORITHMS))
+    try:
+        return algorithm, base64.b64decode(value, validate=True)
+    except binascii.Error:
+        raise ValueError('Upload-Checksum digest is not base64.')
+
+
+def start_upload(course, user, title, filename, size):
+    upload = MaterialUpload.objects.create(
+        course=course, uploaded_by=user, title=title,
+        filename=os.path.basename(filename), size=size,
+    )
+    os.makedirs(settings.MATERIAL_UPLOAD_DIR, exist_ok=True)
+    open(upload.part_path, 'wb').close()
+    return upload
+
+
+class UploadConflict(Exception):
+    """The upload moved on (or went away) while a chunk was being written."""
+
+
+def claim_upload(upload, offset):
+    """Reserve ``upload`` for one chunk written at ``offset``; returns a claim token or None.
+
+    Fails if the upload isn't at ``offset`` or another PATCH is writing to it.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.MATERIAL_UPLOAD_CLAIM_TIMEOUT)
+    token = uuid.uuid4()
+    claimed = MaterialUpload.objects.filter(
+        Q(claim__isnull=True) | Q(claimed_at__lt=stale),
+        pk=upload.pk, offset=offset, offset__lt=upload.size,
+    ).update(claim=token, claimed_at=now)
+    return token if claimed else None
+
+
+def append_chunk(upload, token, stream, length, checksum):
+    """Write ``length`` bytes from ``stream`` at the upload's offset under claim ``token``.
+
+    Returns False, leaving the part file as it was, if what arrived doesn't
+    match ``checksum`` (including a body cut short). Raises UploadConflict if
+    the claim was lost meanwhile. Once the last byte is in, the claim is kept
+    so nothing else touches the upload before it is completed.
+    """
+    algorithm, expected = checksum
+    digest = hashlib.new(algorithm)
+    with open(upload.part_path, 'r+b') as part:
+        part.seek(upload.offset)
+        remaining = length
+        while remaining:
+            data = stream.read(min(COPY_SIZE, remaining))
+            if not data:
+                break
+            digest.update(data)
+            part.write(data)
+            remaining -= len(data)
+        if remaining or digest.digest() != expected:
+            part.truncate(upload.offset)
+            MaterialUpload.objects.filter(pk=upload.pk, claim=token).update(claim=None, claimed_at=None)
+            return False
+
+    offset = upload.offset + length
+    done = offset == upload.size
+    advanced = MaterialUpload.objects.filter(pk=upload.pk, claim=token, offset=upload.offset).update(
+        offset=offset, claim=token if done else None, claimed_at=timezone.now() if done else None,
+    )
+    if not advanced:
+        raise UploadConflict
+    upload.offset = offset
+    return True
+
+
+class _PartFile(File):
+    # FileSystemStorage moves files exposing temporary_file_path() instead of copying them
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def complete_upload(upload):
+    material = CourseMaterial(course_id=upload.course_id, title=upload.title)
+    with open(upload.part_path, 'rb') as part:
+        material.file.save(upload.filename, _PartFile(part, name=upload.filename))
+    MaterialUpload.objects.filter(pk=upload.pk).update(material=material, claim=None, claimed_at=None)
+    upload.material = material
+    return material
@@ -7,5 +7,9 @@ urlpatterns = [
     path('course/<int:course_id>/', views.course_detail, name='course_detail'),
     path('course/<int:course_id>/add_material/', views.add_course_material, name='add_course_material'),
     path('course/<int:course_id>/delete/', views.delete_course, name='delete_course'),
+    path('course/<int:course_id>/uploads/', views.create_material_upload, name='create_material_upload'),
+    path('uploads/<uuid:upload_id>/', views.material_upload, name='material_upload'),
+    path('material/<int:material_id>/', views.download_course_material, name='download_course_material'),
+    path('material/<int:material_id>/preview/', views.course_material_preview, name='course_material_preview'),
     path('material/<int:material_id>/delete/', views.delete_course_material, name='delete_course_material'),
 ]
\ No newline at end of file
@@ -1,20 +1,36 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import os
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.urls import reverse
+from django.conf import settings
 from django.contrib.auth.decorators import login_required, user_passes_test
-from .models import Course, CourseMaterial
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_http_methods, require_safe
+from authentication.decorators import async_user
+from authentication.roles import ais_teacher, is_student, is_teacher
+from .cache import aget_course_catalog, aget_course_materials
+from .downloads import file_response
+from .models import Course, CourseMaterial, MaterialUpload
+from .uploads import (
+    CHECKSUM_ALGORITHMS, TUS_EXTENSIONS, TUS_VERSION, UploadConflict, append_chunk, claim_upload,
+    complete_upload, parse_checksum, parse_metadata, start_upload,
+)
 from .forms import CourseForm, CourseMaterialForm
 
 def teacher_required(function):
-    return user_passes_test(lambda u: u.groups.filter(name='Teacher').exists(), login_url='/')(function)
+    return user_passes_test(is_teacher, login_url='/')(function)
 
 @login_required
-def dashboard(request):
-    if request.user.groups.filter(name='Teacher').exists():
+@async_user
+async def dashboard(request):
+    if await ais_teacher(request.user):
         role = 'Teacher'
-        courses = Course.objects.filter(teacher=request.user)
+        courses = await aget_course_catalog(teacher=request.user)
     else:
         role = 'Student'
-        courses = Course.objects.all()
-    return render(request, 'classmeet/dashboard.html', {'courses': courses, 'role': role})
+        courses = await aget_course_catalog()
+    # Context processors are sync; the template renders in a worker thread
+    return await sync_to_async(render)(request, 'classmeet/dashboard.html', {'courses': courses, 'role': role})
 
 @login_required
 @teacher_required
@@ -31,10 +47,11 @@ def create_course(request):
     return render(request, 'classmeet/create_course.html', {'form': form})
 
 @login_required
-def course_detail(request, course_id):
-    course = get_object_or_404(Course, id=course_id)
-    materials = course.materials.all()
-    return render(request, 'classmeet/course_detail.html', {'course': course, 'materials': materials})
+@async_user
+async def course_detail(request, course_id):
+    course = await aget_object_or_404(Course.objects.select_related('teacher'), id=course_id)
+    materials = await aget_course_materials(course)
+    return await sync_to_async(render)(request, 'classmeet/course_detail.html', {'course': course, 'materials': materials})
 
 @login_required
 @teacher_required
@@ -49,7 +66,9 @@ def add_course_material(request, course_id):
             return redirect('course_detail', course_id=course.id) # Redirect to course detail
     else:
         form = CourseMaterialForm()
-    return render(request, 'classmeet/add_course_material.html', {'form': form, 'course': course})
+    return render(request, 'classmeet/add_course_material.html', {
+        'form': form, 'course': course, 'chunk_size': settings.MATERIAL_UPLOAD_CHUNK_SIZE,
+    })
 
 @login_required
 @teacher_required
@@ -73,3 +92,114 @@ def delete_course_material(request, material_id):
         material.delete()
         return redirect('course_detail', course_id=course_id)
     return redirect('course_detail', course_id=material.course.id) # Or render a confirmation page
+
+def _can_read_material(user, material):
+    # Students may open any course's materials; otherwise only the course's teacher
+    return user.id == material.course.teacher_id or is_student(user)
+
+@login_required
+@require_safe
+def download_course_material(request, material_id):
+    material = get_object_or_404(CourseMaterial.objects.select_related('course'), id=material_id)
+    if not _can_read_material(request.user, material):
+        return redirect('dashboard')
+    # Stored names are content hashes; offer the material's title instead
+    extension = os.path.splitext(material.file.name)[1]
+    return file_response(
+        request, material.file, as_attachment='download' in request.GET, filename=material.title + extension,
+    )
+
+@login_required
+@require_safe
+def course_material_preview(request, material_id):
+    material = get_object_or_404(CourseMaterial.objects.select_related('course'), id=material_id)
+    if not material.preview:
+        raise Http404('This material has no preview.')
+    if not _can_read_material(request.user, material):
+        return redirect('dashboard')
+    return file_response(request, material.preview)
+
+def _tus_response(status, **headers):
+    response = HttpResponse(status=status)
+    response['Tus-Resumable'] = TUS_VERSION
+    response['Cache-Control'] = 'no-store'
+    for name, value in headers.items():
+        response[name.replace('_', '-')] = str(value)
+    return response
+
+@login_required
+@teacher_required
+@require_http_methods(['POST', 'OPTIONS'])
+def create_material_upload(request, course_id):
+    course = get_object_or_404(Course, id=course_id, teacher=request.user)
+    if request.method == 'OPTIONS':
+        return _tus_response(
+            204, Tus_Version=TUS_VERSION, Tus_Extension=TUS_EXTENSIONS,
+            Tus_Max_Size=settings.MATERIAL_UPLOAD_MAX_SIZE,
+            Tus_Checksum_Algorithm=','.join(CHECKSUM_ALGORITHMS),
+        )
+    try:
+        size = int(request.headers['Upload-Length'])
+        metadata = parse_metadata(request.headers.get('Upload-Metadata'))
+        filename = metadata['filename']
+    except (KeyError, ValueError):
+        return _tus_response(400)
+    title = metadata.get('title') or filename
+    if (
+        not os.path.basename(filename)
+        or len(os.path.basename(filename)) > MaterialUpload._meta.get_field('filename').max_length
+        or len(title) > MaterialUpload._meta.get_field('title').max_length
+    ):
+        return _tus_response(400)
+    if not 0 < size <= settings.MATERIAL_UPLOAD_MAX_SIZE:
+        return _tus_response(413)
+    upload = start_upload(course, request.user, title, filename, size)
+    return _tus_response(201, Location=reverse('material_upload', args=[upload.id]))
+
+@login_required
+@teacher_required
+@require_http_methods(['HEAD', 'PATCH', 'DELETE'])
+def material_upload(request, upload_id):
+    upload = get_object_or_404(MaterialUpload, id=upload_id, uploaded_by=request.user)
+    if request.method == 'HEAD':
+        return _tus_response(200, Upload_Offset=upload.offset, Upload_Length=upload.size)
+    if request.method == 'DELETE':
+        upload.delete()
+        return _tus_response(204)
+    if upload.material_id:
+        # The last chunk arrived but its response may not have; say so again
+        return _tus_response(
+            204, Upload_Offset=upload.size,
+            Location=reverse('download_course_material', args=[upload.material_id]),
+        )
+
+    if request.content_type != 'application/offset+octet-stream':
+        return _tus_response(415)
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        length = int(request.headers['Content-Length'])
+        checksum = parse_checksum(request.headers.get('Upload-Checksum'))
+    except (KeyError, ValueError):
+        return _tus_response(400)
+    if length > settings.MATERIAL_UPLOAD_CHUNK_SIZE or offset + length > upload.size:
+        return _tus_response(413)
+    # Claimed rather than locked: the body can take minutes to arrive
+    token = claim_upload(upload, offset)
+    if token is None:
+        # Stale offset, or another request is still writing a chunk
+        return _tus_response(409, Upload_Offset=upload.offset)
+    upload.offset = offset
+    try:
+        if not append_chunk(upload, token, request, length, checksum):
+            # tus "checksum mismatch"; the client resends the chunk
+            return _tus_response(460, Upload_Offset=upload.offset)
+    except UploadConflict:
+        upload = get_object_or_404(MaterialUpload, id=upload_id)
+        return _tus_response(409, Upload_Offset=upload.offset)
+    if upload.offset < upload.size:
+        return _tus_response(204, Upload_Offset=upload.offset)
+    material = complete_upload(upload)
+    return _tus_response(
+        204, Upload_Offset=upload.size,
+        Location=reverse('download_course_material', args=[material.id]),
+    )
@@ -0,0 +1,32 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count_subquery(model, fk_name):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{fk_name: OuterRef('pk')})
+            .order_by()
+            .values(fk_name)
+            .annotate(n=Count('*'))
+            .values('n')
+        ),
+        0,
+    )
+
+
+def reconcile_counters(discussion_model, comment_model):
+    """Rewrite upvote_count/comment_count wherever they drifted from the real rows.
+
+    Takes the model classes so data migrations can pass historical models.
+    Returns the number of discussions that were corrected.
+    """
+    upvote_model = discussion_model.upvoters.through
+    drifted = discussion_model.objects.annotate(
+        actual_upvotes=_count_subquery(upvote_model, 'discussion'),
+        actual_comments=_count_subquery(comment_model, 'discussion'),
+    ).filter(~Q(upvote_count=F('actual_upvotes')) | ~Q(comment_count=F('actual_comments')))
+    return discussion_model.objects.filter(pk__in=drifted.values('pk')).update(
+        upvote_count=_count_subquery(upvote_model, 'discussion'),
+        comment_count=_count_subquery(comment_model, 'discussion'),
+    )
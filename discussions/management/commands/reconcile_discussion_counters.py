@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from discussions.counters import reconcile_counters
+from discussions.models import Comment, Discussion
+
+
+class Command(BaseCommand):
+    help = 'Recompute Discussion.upvote_count and comment_count where they drifted from the real rows.'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_counters(Discussion, Comment)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters on {fixed} discussion(s).'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['discussion', 'created_at', 'id'], name='comment_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discussion',
+            index=models.Index(fields=['-created_at', '-id'], name='discussion_created_idx'),
+        ),
+    ]
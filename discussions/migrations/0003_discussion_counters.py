@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:13
+
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    from discussions.counters import reconcile_counters
+
+    reconcile_counters(apps.get_model('discussions', 'Discussion'), apps.get_model('discussions', 'Comment'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussions', '0002_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussion',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='discussion',
+            name='upvote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
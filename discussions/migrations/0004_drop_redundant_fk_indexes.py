@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussions', '0003_discussion_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='discussion',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='discussions.discussion'),
+        ),
+    ]
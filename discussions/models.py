@@ -7,19 +7,29 @@ class Discussion(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     upvoters = models.ManyToManyField(User, related_name='upvoted_discussions', blank=True)
+    # Denormalized counters, updated with F() expressions; see reconcile_discussion_counters
+    upvote_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.title
 
-    @property
-    def upvote_count(self):
-        return self.upvoters.count()
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='discussion_created_idx'),
+        ]
 
 class Comment(models.Model):
-    discussion = models.ForeignKey(Discussion, on_delete=models.CASCADE, related_name='comments')
+    # comment_thread_idx leads with discussion, so the FK needs no index of its own
+    discussion = models.ForeignKey(Discussion, on_delete=models.CASCADE, related_name='comments', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f'Comment by {self.author.username} on {self.discussion.title}'
\ No newline at end of file
+        return f'Comment by {self.author.username} on {self.discussion.title}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['discussion', 'created_at', 'id'], name='comment_thread_idx'),
+        ]
\ No newline at end of file
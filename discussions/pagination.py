@@ -0,0 +1,85 @@
+import base64
+from datetime import datetime
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list):
+        self.object_list = object_list
+        self.older_cursor = None
+        self.newer_cursor = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(obj):
+    raw = f'{obj.created_at.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _older_than(created_at, pk):
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+
+
+def _newer_than(created_at, pk):
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+
+
+def _plan(queryset, params, per_page, newest_first):
+    # Returns the single range query for the page and how to turn its rows into one
+    before = decode_cursor(params['before']) if params.get('before') else None
+    after = decode_cursor(params['after']) if params.get('after') else None
+    latest = bool(params.get('latest'))
+    desc = queryset.order_by('-created_at', '-pk')
+    asc = queryset.order_by('created_at', 'pk')
+
+    if after:
+        return asc.filter(_newer_than(*after))[:per_page + 1], 'newer', True
+    if before or latest or newest_first:
+        if before:
+            desc = desc.filter(_older_than(*before))
+        return desc[:per_page + 1], 'older', bool(before)
+    return asc[:per_page + 1], 'newer', False
+
+
+def _page(rows, per_page, newest_first, direction, more_behind):
+    # ``direction`` is where the query walked from its starting point; ``more_behind``
+    # says whether rows exist on the other side of it
+    more_ahead = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'older':
+        rows = rows[::-1]
+        more_older, more_newer = more_ahead, more_behind
+    else:
+        more_newer, more_older = more_ahead, more_behind
+
+    # rows are oldest first here; flip for newest-first listings
+    page = KeysetPage(rows[::-1] if newest_first else rows)
+    if rows and more_older:
+        page.older_cursor = encode_cursor(rows[0])
+    if rows and more_newer:
+        page.newer_cursor = encode_cursor(rows[-1])
+    return page
+
+
+async def apaginate_keyset(queryset, params, per_page, newest_first=True):
+    """Return one page of ``queryset`` ordered on ``(created_at, pk)``.
+
+    ``params`` is the request's GET mapping. ``?before=<cursor>`` moves to older
+    rows, ``?after=<cursor>`` to newer ones and ``?latest=1`` jumps to the
+    newest page. Each page costs one indexed range query however deep it is.
+    """
+    query, direction, more_behind = _plan(queryset, params, per_page, newest_first)
+    return _page([row async for row in query], per_page, newest_first, direction, more_behind)
@@ -1,3 +1,125 @@
-from django.test import TestCase
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from lms.testing import QueryBudgetMixin, QueryPlanMixin
+from .models import Comment, Discussion
+from .pagination import encode_cursor
 
-# Create your tests here.
+class DiscussionQueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        discussions = Discussion.objects.bulk_create(
+            Discussion(title=f'd{i}', description='text', author=cls.author) for i in range(500)
+        )
+        Comment.objects.bulk_create(
+            Comment(discussion=discussion, author=cls.author, text=f'c{j}')
+            for discussion in discussions[:50] for j in range(50)
+        )
+        cls.discussion = discussions[0]
+
+    def test_discussion_list_uses_index(self):
+        self.assertUsesIndex(Discussion.objects.order_by('-created_at', '-id')[:20], 'discussion_created_idx')
+
+    def test_comment_thread_uses_index(self):
+        self.assertUsesIndex(self.discussion.comments.order_by('created_at', 'id')[:21], 'comment_thread_idx')
+
+class DiscussionCounterTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.voter = User.objects.create_user(username='voter')
+        self.discussion = Discussion.objects.create(title='d', description='text', author=self.author)
+        self.client.force_login(self.voter)
+
+    def test_upvote_toggles_counter(self):
+        url = reverse('upvote_discussion', args=[self.discussion.id])
+        self.client.post(url)
+        self.discussion.refresh_from_db()
+        self.assertEqual(self.discussion.upvote_count, 1)
+        self.client.post(url)
+        self.discussion.refresh_from_db()
+        self.assertEqual(self.discussion.upvote_count, 0)
+
+    def test_comment_increments_counter(self):
+        self.client.post(reverse('discussion_detail', args=[self.discussion.id]), {'text': 'hello'})
+        self.discussion.refresh_from_db()
+        self.assertEqual(self.discussion.comment_count, 1)
+
+    def test_reconcile_command_fixes_drift(self):
+        Comment.objects.create(discussion=self.discussion, author=self.voter, text='untracked')
+        self.discussion.upvoters.add(self.voter)
+        call_command('reconcile_discussion_counters', stdout=StringIO())
+        self.discussion.refresh_from_db()
+        self.assertEqual((self.discussion.upvote_count, self.discussion.comment_count), (1, 1))
+
+@override_settings(DISCUSSIONS_PER_PAGE=3, COMMENTS_PER_PAGE=3)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.discussions = [
+            Discussion.objects.create(title=f'd{i}', description='text', author=cls.author) for i in range(7)
+        ]
+        cls.thread = cls.discussions[0]
+        for i in range(7):
+            Comment.objects.create(discussion=cls.thread, author=cls.author, text=f'c{i}')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def _walk(self, url, context_name, cursor_name, param):
+        seen, params = [], {}
+        while True:
+            page = self.client.get(url, params).context[context_name]
+            seen.extend(page)
+            cursor = getattr(page, cursor_name)
+            if not cursor:
+                return seen
+            params = {param: cursor}
+
+    def test_discussion_list_walks_newest_to_oldest(self):
+        seen = self._walk(reverse('discussion_list'), 'discussions', 'older_cursor', 'before')
+        self.assertEqual(seen, self.discussions[::-1])
+
+    def test_discussion_list_walks_back_to_newest(self):
+        oldest_page = self.client.get(reverse('discussion_list'), {'before': encode_cursor(self.discussions[3])})
+        seen = self._walk(reverse('discussion_list'), 'discussions', 'newer_cursor', 'after')
+        self.assertEqual(list(oldest_page.context['discussions']), self.discussions[:3][::-1])
+        self.assertEqual(len(seen), 3)
+
+    def test_comment_thread_walks_oldest_to_newest(self):
+        url = reverse('discussion_detail', args=[self.thread.id])
+        seen = self._walk(url, 'comments', 'newer_cursor', 'after')
+        self.assertEqual([c.text for c in seen], [f'c{i}' for i in range(7)])
+
+    def test_latest_comment_page(self):
+        url = reverse('discussion_detail', args=[self.thread.id])
+        page = self.client.get(url, {'latest': 1}).context['comments']
+        self.assertEqual([c.text for c in page], ['c4', 'c5', 'c6'])
+        self.assertIsNone(page.newer_cursor)
+        self.assertIsNotNone(page.older_cursor)
+
+
+class DiscussionQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        for i in range(25):
+            author = User.objects.create_user(username=f'author{i}')
+            discussion = Discussion.objects.create(title=f'd{i}', description='text', author=author,
+                                                   upvote_count=1, comment_count=3)
+            discussion.upvoters.add(author)
+            for j in range(3):
+                Comment.objects.create(discussion=discussion, author=author, text=f'c{j}')
+        cls.discussion = discussion
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def test_discussion_list(self):
+        self.assertViewWithinBudget(2, reverse('discussion_list'))
+
+    def test_discussion_detail(self):
+        self.assertViewWithinBudget(4, reverse('discussion_detail', args=[self.discussion.id]))
@@ -1,15 +1,28 @@
-
-from django.shortcuts import render, redirect, get_object_or_404
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
 from .models import Discussion, Comment
 from .forms import DiscussionForm, CommentForm
-from notifications.models import Notification
+from .pagination import apaginate_keyset
+from authentication.decorators import async_user
+from notifications.models import Broadcast, Notification
 
 @login_required
-def discussion_list(request):
-    discussions = Discussion.objects.all().order_by('-created_at')
-    return render(request, 'discussions/discussion_list.html', {'discussions': discussions})
+@async_user
+async def discussion_list(request):
+    discussions = await apaginate_keyset(
+        Discussion.objects.select_related('author'),
+        request.GET,
+        per_page=settings.DISCUSSIONS_PER_PAGE,
+        newest_first=True,
+    )
+    # Context processors are sync; the template renders in a worker thread
+    return await sync_to_async(render)(request, 'discussions/discussion_list.html', {'discussions': discussions})
 
 @login_required
 def create_discussion(request):
@@ -18,18 +31,18 @@ def create_discussion(request):
         if form.is_valid():
             discussion = form.save(commit=False)
             discussion.author = request.user
-            discussion.save()
-            discussion.upvoters.add(request.user)
+            discussion.upvote_count = 1
+            with transaction.atomic():
+                discussion.save()
+                discussion.upvoters.add(request.user)
 
-            # Notify all other users
-            other_users = User.objects.exclude(id=request.user.id)
-            for user in other_users:
-                Notification.objects.create(
-                    recipient=user,
-                    sender=request.user,
-                    message=f'{request.user.username} started a new discussion: "{discussion.title}"',
-                    discussion=discussion
-                )
+            # Notify all other users with a single broadcast row
+            Broadcast.objects.create(
+                sender=request.user,
+                message=f'{request.user.username} started a new discussion: "{discussion.title}"',
+                audience=Broadcast.AUDIENCE_ALL,
+                discussion=discussion
+            )
 
             return redirect('discussion_detail', discussion_id=discussion.id)
     else:
@@ -37,52 +50,83 @@ def create_discussion(request):
     return render(request, 'discussions/create_discussion.html', {'form': form})
 
 @login_required
-def discussion_detail(request, discussion_id):
-    discussion = get_object_or_404(Discussion, id=discussion_id)
-    comments = discussion.comments.all().order_by('created_at')
+@async_user
+async def discussion_detail(request, discussion_id):
+    discussion = await aget_object_or_404(Discussion.objects.select_related('author'), id=discussion_id)
     comment_form = CommentForm()
 
     if request.method == 'POST':
-        form = CommentForm(request.POST)
-        if form.is_valid():
-            comment = form.save(commit=False)
-            comment.discussion = discussion
-            comment.author = request.user
-            comment.save()
-
-            # Notify the discussion author
-            if discussion.author != request.user:
-                Notification.objects.create(
-                    recipient=discussion.author,
-                    sender=request.user,
-                    message=f'{request.user.username} commented on your discussion: "{discussion.title}"',
-                    discussion=discussion
-                )
-
-            return redirect('discussion_detail', discussion_id=discussion.id)
+        response = await sync_to_async(_post_comment)(request, discussion)
+        if response:
+            return response
 
-    return render(request, 'discussions/discussion_detail.html', {
+    # The comment page and the upvote check are independent
+    comments, has_upvoted = await asyncio.gather(
+        apaginate_keyset(
+            discussion.comments.select_related('author'),
+            request.GET,
+            per_page=settings.COMMENTS_PER_PAGE,
+            newest_first=False,
+        ),
+        discussion.upvoters.filter(id=request.user.id).aexists(),
+    )
+    return await sync_to_async(render)(request, 'discussions/discussion_detail.html', {
         'discussion': discussion,
         'comments': comments,
-        'comment_form': comment_form
+        'comment_form': comment_form,
+        'has_upvoted': has_upvoted
     })
 
+def _post_comment(request, discussion):
+    # Runs in a worker thread: transactions are not available to async code
+    form = CommentForm(request.POST)
+    if not form.is_valid():
+        return None
+    comment = form.save(commit=False)
+    comment.discussion = discussion
+    comment.author = request.user
+    with transaction.atomic():
+        comment.save()
+        Discussion.objects.filter(id=discussion.id).update(comment_count=F('comment_count') + 1)
+
+    # Notify the discussion author
+    if discussion.author != request.user:
+        Notification.objects.create(
+            recipient=discussion.author,
+            sender=request.user,
+            message=f'{request.user.username} commented on your discussion: "{discussion.title}"',
+            discussion=discussion
+        )
+
+    # Land on the last page so the new comment is visible
+    return redirect(reverse('discussion_detail', args=[discussion.id]) + '?latest=1#comments')
+
 @login_required
 def upvote_discussion(request, discussion_id):
     discussion = get_object_or_404(Discussion, id=discussion_id)
     user = request.user
 
-    if user in discussion.upvoters.all():
-        discussion.upvoters.remove(user)
-    else:
-        discussion.upvoters.add(user)
-        # Notify the discussion author only when adding an upvote
-        if discussion.author != user:
-            Notification.objects.create(
-                recipient=discussion.author,
-                sender=user,
-                message=f'{user.username} upvoted your discussion: "{discussion.title}"',
-                discussion=discussion
-            )
+    Upvote = Discussion.upvoters.through
+    added = False
+
+    with transaction.atomic():
+        # The through row is the source of truth; the counter only moves by the rows
+        # actually deleted or inserted, so concurrent double-clicks cannot drift it.
+        removed, _ = Upvote.objects.filter(discussion=discussion, user=user).delete()
+        if removed:
+            Discussion.objects.filter(id=discussion.id).update(upvote_count=F('upvote_count') - removed)
+        else:
+            _, added = Upvote.objects.get_or_create(discussion=discussion, user=user)
+            if added:
+                Discussion.objects.filter(id=discussion.id).update(upvote_count=F('upvote_count') + 1)
+
+    # Notify the discussion author only when adding an upvote
+    if added and discussion.author_id != user.id:
+        Notification.objects.create(
+            recipient=discussion.author,
+            sender=user,
+            message=f'{user.username} upvoted your discussion: "{discussion.title}"',
+            discussion=discussion
+        )
     
     return redirect('discussion_detail', discussion_id=discussion.id)
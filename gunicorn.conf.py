@@ -0,0 +1,35 @@
+"""Gunicorn settings for serving the ASGI application in production.
+
+    gunicorn lms.asgi:application -c gunicorn.conf.py
+
+Each worker is a uvicorn event loop serving both HTTP and WebSockets. Workers
+share nothing in-process: the channel layer, meeting presence registry, cache
+and sessions all live in Redis, so a signaling message reaches its peer
+whichever worker (or machine) holds the socket.
+
+To run HTTP and WebSocket traffic in separate pools, start two instances with
+ASGI_PROTOCOLS=http and ASGI_PROTOCOLS=websocket on different ports and route
+/ws/ to the second at the proxy (see Procfile).
+"""
+
+import multiprocessing
+# Imported as a module: a top-level `config` would be read as gunicorn's own setting
+import decouple
+
+bind = f"0.0.0.0:{decouple.config('PORT', default=8000, cast=int)}"
+
+# One event loop per core; async workers do not need the 2n+1 of sync ones
+workers = decouple.config('WEB_CONCURRENCY', default=multiprocessing.cpu_count(), cast=int)
+worker_class = 'uvicorn_worker.UvicornWorker'
+
+keepalive = decouple.config('KEEPALIVE', default=5, cast=int)
+timeout = decouple.config('WORKER_TIMEOUT', default=30, cast=int)
+# Give open meeting sockets time to close cleanly on deploys
+graceful_timeout = decouple.config('GRACEFUL_TIMEOUT', default=30, cast=int)
+
+# Trust X-Forwarded-* only from the proxy in front of us
+forwarded_allow_ips = decouple.config('FORWARDED_ALLOW_IPS', default='127.0.0.1')
+
+accesslog = '-'
+errorlog = '-'
+loglevel = decouple.config('LOG_LEVEL', default='info')
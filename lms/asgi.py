@@ -10,18 +10,29 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 import django
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.routing import ChannelNameRouter, ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-from meetings.routing import websocket_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lms.settings')
 django.setup()
 
-application = ProtocolTypeRouter({
+from meetings.routing import websocket_urlpatterns
+from meetings.sfu import SFUConsumer, sfu_channel_names
+
+protocols = {
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
         URLRouter(websocket_urlpatterns)
     ),
+}
+
+application = ProtocolTypeRouter({
+    **{name: app for name, app in protocols.items() if name in settings.ASGI_PROTOCOLS},
+    # SFU media relay workers (python manage.py runworker meeting-sfu-0)
+    "channel": ChannelNameRouter({
+        name: SFUConsumer.as_asgi() for name in sfu_channel_names()
+    }),
 })
 
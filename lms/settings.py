@@ -14,6 +14,7 @@ from pathlib import Path
 from decouple import config, Csv
 import dj_database_url
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -28,6 +29,9 @@ SECRET_KEY = config('SECRET_KEY')
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config('DEBUG', default=False, cast=bool)
 
+# True while running `manage.py test`; swaps networked backends for in-process ones
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 ALLOWED_HOSTS = config('ALLOWED_HOSTS', cast=Csv())
 CSRF_TRUSTED_ORIGINS = config('CSRF_TRUSTED_ORIGINS', cast=Csv())
 
@@ -48,6 +52,7 @@ INSTALLED_APPS = [
     'discussions',
     'notifications',
     'meetings',
+    'search',
     'django_celery_beat',
     'channels',
 ]
@@ -55,23 +60,126 @@ INSTALLED_APPS = [
 # Channels Configuration
 ASGI_APPLICATION = 'lms.asgi.application'
 
+# Protocols this process serves; run separate HTTP and WebSocket pools with
+# ASGI_PROTOCOLS=http and ASGI_PROTOCOLS=websocket
+ASGI_PROTOCOLS = config('ASGI_PROTOCOLS', default='http,websocket', cast=Csv())
+
 REDIS_URL = config('REDIS_URL')
 
+# Messages a socket's channel may hold before further sends to it are dropped
+MEETING_CHANNEL_CAPACITY = config('MEETING_CHANNEL_CAPACITY', default=200, cast=int)
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
             "hosts": [REDIS_URL],
+            "capacity": MEETING_CHANNEL_CAPACITY,
         },
     },
 }
 
+if TESTING:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+            "CONFIG": {
+                "capacity": MEETING_CHANNEL_CAPACITY,
+            },
+        },
+    }
+
+# Meeting presence: clients heartbeat every MEETING_HEARTBEAT_INTERVAL seconds and
+# sockets silent for MEETING_PRESENCE_TTL seconds are dropped from the room
+MEETING_HEARTBEAT_INTERVAL = config('MEETING_HEARTBEAT_INTERVAL', default=15, cast=int)
+MEETING_PRESENCE_TTL = config('MEETING_PRESENCE_TTL', default=45, cast=int)
+
+# ICE candidates sent to the same peer within this many milliseconds are
+# delivered as one batched frame
+MEETING_ICE_BATCH_WINDOW = config('MEETING_ICE_BATCH_WINDOW', default=20, cast=int)
+
+# Signaling flood protection, per socket: MEETING_RATE_LIMIT frames/sec with bursts
+# of MEETING_RATE_BURST; frames over the limit are dropped and the socket is closed
+# after MEETING_MAX_DROPPED_FRAMES of them. Frames over MEETING_MAX_MESSAGE_SIZE
+# characters, and sockets more than MEETING_MAX_QUEUE_DELAY seconds behind their
+# room, are disconnected.
+MEETING_RATE_LIMIT = config('MEETING_RATE_LIMIT', default=20, cast=int)
+MEETING_RATE_BURST = config('MEETING_RATE_BURST', default=60, cast=int)
+MEETING_MAX_DROPPED_FRAMES = config('MEETING_MAX_DROPPED_FRAMES', default=200, cast=int)
+MEETING_MAX_MESSAGE_SIZE = config('MEETING_MAX_MESSAGE_SIZE', default=64 * 1024, cast=int)
+MEETING_MAX_QUEUE_DELAY = config('MEETING_MAX_QUEUE_DELAY', default=10, cast=int)
+
+# Meetings in SFU media mode are relayed by `runworker meeting-sfu-<n>` processes;
+# rooms are spread across MEETING_SFU_SHARDS of them
+MEETING_SFU_SHARDS = config('MEETING_SFU_SHARDS', default=1, cast=int)
+
+# Cache Configuration
+# Redis in production; set CACHE_URL=locmem:// for a per-process cache in local development.
+CACHE_URL = config('CACHE_URL', default=REDIS_URL)
+
+if TESTING or CACHE_URL.startswith('locmem://'):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+            "KEY_PREFIX": "lms",
+        },
+    }
+
+# Sessions are read from the cache and written through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Seconds the course catalog and material lists stay cached; model signals invalidate them sooner
+COURSE_CACHE_TIMEOUT = config('COURSE_CACHE_TIMEOUT', default=600, cast=int)
+
+# Course materials are only served through the authenticated download view. Behind
+# nginx, set this to an `internal` location aliased to MEDIA_ROOT (e.g.
+# /protected-media/) and nginx sends the file once the view has checked access.
+MATERIAL_ACCEL_REDIRECT = config('MATERIAL_ACCEL_REDIRECT', default='')
+
+# Seconds a meeting's access rules (course teacher, media mode) stay cached; model signals invalidate them sooner
+MEETING_ACL_CACHE_TIMEOUT = config('MEETING_ACL_CACHE_TIMEOUT', default=600, cast=int)
+
 # Celery Configuration
 CELERY_BROKER_URL = REDIS_URL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Tasks run inline under test, without a broker
+CELERY_TASK_ALWAYS_EAGER = TESTING
+CELERY_BEAT_SCHEDULE = {
+    'expire-material-uploads': {
+        'task': 'classmeet.tasks.expire_material_uploads',
+        'schedule': 3600,
+    },
+    'collect-material-blobs': {
+        'task': 'classmeet.tasks.collect_material_blobs',
+        'schedule': 3600,
+    },
+}
+
+# Unread badge: number of items shown in the dropdown and how long the summary is cached
+NOTIFICATION_PREVIEW_LIMIT = config('NOTIFICATION_PREVIEW_LIMIT', default=10, cast=int)
+NOTIFICATION_CACHE_TIMEOUT = config('NOTIFICATION_CACHE_TIMEOUT', default=300, cast=int)
+
+# Keyset pagination page sizes
+DISCUSSIONS_PER_PAGE = config('DISCUSSIONS_PER_PAGE', default=20, cast=int)
+COMMENTS_PER_PAGE = config('COMMENTS_PER_PAGE', default=50, cast=int)
+
+# Search results per page, and how many of the newest matches are ranked
+# (0 ranks every match: exact relevance, but slower for common words)
+SEARCH_RESULTS_PER_PAGE = config('SEARCH_RESULTS_PER_PAGE', default=20, cast=int)
+SEARCH_MAX_CANDIDATES = config('SEARCH_MAX_CANDIDATES', default=1000, cast=int)
+
+# Seconds a user's resolved groups stay cached; group changes invalidate immediately
+ROLE_CACHE_TIMEOUT = config('ROLE_CACHE_TIMEOUT', default=300, cast=int)
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -108,12 +216,52 @@ WSGI_APPLICATION = 'lms.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Which Procfile process this is: web, ws, worker, beat or sfu. Connection reuse and
+# pool sizes below default per process type.
+PROCESS_TYPE = config('PROCESS_TYPE', default='web')
+ASGI_PROCESS = PROCESS_TYPE in ('web', 'ws', 'sfu')
+
+# ASGI runs each request's sync code on a short-lived thread, so persistent
+# per-thread connections would leak there; ASGI processes use psycopg's pool instead.
+# Celery workers and beat are long-lived and single-threaded: one connection kept
+# open for DATABASE_CONN_MAX_AGE seconds is all the pooling they need.
+DATABASE_POOL = config('DATABASE_POOL', default=ASGI_PROCESS, cast=bool)
+DATABASE_CONN_MAX_AGE = config('DATABASE_CONN_MAX_AGE', default=0 if ASGI_PROCESS else 600, cast=int)
+
+# Pool bounds per process; the sum of max sizes across all processes must fit the
+# server's max_connections
+_pool_min, _pool_max = {
+    'web': (2, 10), 'ws': (2, 10), 'sfu': (1, 4), 'worker': (1, 2), 'beat': (1, 1),
+}.get(PROCESS_TYPE, (1, 4))
+DATABASE_POOL_MIN_SIZE = config('DATABASE_POOL_MIN_SIZE', default=_pool_min, cast=int)
+DATABASE_POOL_MAX_SIZE = config('DATABASE_POOL_MAX_SIZE', default=_pool_max, cast=int)
+# Seconds a request waits for a free pooled connection before erroring
+DATABASE_POOL_TIMEOUT = config('DATABASE_POOL_TIMEOUT', default=10, cast=int)
+
+# Behind pgbouncer in transaction mode pgbouncer is the pool: Django neither pools
+# nor uses server-side cursors, which don't survive across transactions there
+DATABASE_PGBOUNCER = config('DATABASE_PGBOUNCER', default=False, cast=bool)
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=config('DATABASE_URL')
+        default=config('DATABASE_URL'),
+        conn_health_checks=True,
+        disable_server_side_cursors=DATABASE_PGBOUNCER,
     )
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql' and DATABASE_POOL and not DATABASE_PGBOUNCER:
+    # The pool replaces persistent connections; Django rejects both at once.
+    # CONN_HEALTH_CHECKS makes the pool check a connection before handing it out.
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': DATABASE_POOL_MIN_SIZE,
+        'max_size': DATABASE_POOL_MAX_SIZE,
+        'timeout': DATABASE_POOL_TIMEOUT,
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = DATABASE_CONN_MAX_AGE
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -164,3 +312,22 @@ LOGIN_URL = '/auth/signin/'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Widths (px) course thumbnails are resized to for the dashboard's srcset
+COURSE_THUMBNAIL_WIDTHS = config('COURSE_THUMBNAIL_WIDTHS', default='320,640,960', cast=Csv(int))
+
+# Chunked material uploads are assembled here; keep it on MEDIA_ROOT's filesystem so
+# finished files are moved into place rather than copied
+MATERIAL_UPLOAD_DIR = config('MATERIAL_UPLOAD_DIR', default=str(MEDIA_ROOT / 'material_uploads'))
+MATERIAL_UPLOAD_MAX_SIZE = config('MATERIAL_UPLOAD_MAX_SIZE', default=5 * 1024 ** 3, cast=int)
+# Largest chunk accepted per PATCH (the browser client sends chunks of this size)
+MATERIAL_UPLOAD_CHUNK_SIZE = config('MATERIAL_UPLOAD_CHUNK_SIZE', default=8 * 1024 ** 2, cast=int)
+# Seconds after which a chunk still being written is presumed abandoned and the
+# upload can be resumed by another request
+MATERIAL_UPLOAD_CLAIM_TIMEOUT = config('MATERIAL_UPLOAD_CLAIM_TIMEOUT', default=600, cast=int)
+# Hours an unfinished upload can be resumed before expire_material_uploads discards it
+MATERIAL_UPLOAD_EXPIRY = config('MATERIAL_UPLOAD_EXPIRY', default=24, cast=int)
+
+# Course material files are stored once per distinct content. A file no material
+# references any more is deleted once it has been untouched for this many seconds.
+MATERIAL_BLOB_GRACE = config('MATERIAL_BLOB_GRACE', default=3600, cast=int)
@@ -0,0 +1,52 @@
+"""Shared helpers for the apps' test suites."""
+
+from contextlib import contextmanager
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryPlanMixin:
+    """TestCase mixin asserting that a queryset is answered from a given index.
+
+    The planner is left to its own choices, with statistics refreshed by
+    ANALYZE first, so tests must seed rows in realistic numbers and
+    proportions for the index to pay off. The check is that the expected
+    index's name appears in the plan, on PostgreSQL and SQLite alike.
+    """
+
+    def assertUsesIndex(self, queryset, index):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        plan = queryset.explain()
+        self.assertIn(index, plan, f'{index} is not used:\n{plan}')
+
+
+class QueryBudgetMixin:
+    """TestCase mixin pinning a block of code to a maximum number of queries.
+
+    Unlike ``assertNumQueries`` this is an upper bound, so a view can get
+    cheaper without breaking its test, but an N+1 regression cannot slip in.
+    """
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        queries = '\n'.join(f'{i}. {query["sql"]}' for i, query in enumerate(context.captured_queries, 1))
+        self.assertLessEqual(
+            len(context), budget,
+            f'{len(context)} queries executed, budget is {budget}:\n{queries}',
+        )
+
+    def assertViewWithinBudget(self, budget, url, data=None, reset=None):
+        # The first request warms per-user caches (notification badge, roles);
+        # the budget applies to the steady state. ``reset`` runs in between to
+        # empty shared data caches again, so the queries behind them are
+        # measured too instead of being served from the warm-up.
+        self.client.get(url, data)
+        if reset:
+            reset()
+        with self.assertMaxQueries(budget):
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return response
@@ -26,7 +26,9 @@ urlpatterns = [
     path('discussions/', include('discussions.urls')),
     path('notifications/', include('notifications.urls')),
     path('meetings/', include('meetings.urls')),
+    path('search/', include('search.urls')),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Course materials are served by classmeet's download view, behind its access check
+    urlpatterns += static(settings.MEDIA_URL + 'course_thumbnails/', document_root=settings.MEDIA_ROOT / 'course_thumbnails')
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from authentication.roles import is_student
+from .models import Meeting
+
+
+def _acl_key(meeting_id):
+    return f'meetings:acl:{meeting_id}'
+
+
+def get_meeting_acl(meeting_id):
+    """What joining a meeting depends on, as ``{'teacher_id', 'media_mode'}``.
+
+    Resolved once (meeting -> course -> teacher) and shared through the cache by
+    the meeting room view and every WebSocket connect. Unknown meetings are
+    cached as ``None`` too, so probing ids cannot reach the database each time.
+    Ids that aren't integers (the WebSocket route accepts any word) are unknown.
+    """
+    try:
+        meeting_id = int(meeting_id)
+    except (TypeError, ValueError):
+        return None
+    acl = cache.get(_acl_key(meeting_id), False)
+    if acl is False:
+        acl = (
+            Meeting.objects.filter(id=meeting_id)
+            .values('media_mode', teacher_id=F('course__teacher_id'))
+            .first()
+        )
+        cache.set(_acl_key(meeting_id), acl, settings.MEETING_ACL_CACHE_TIMEOUT)
+    return acl
+
+
+def can_join_meeting(user, meeting_id):
+    # Students may join any meeting; otherwise only the course's teacher
+    if not user.is_authenticated:
+        return False
+    acl = get_meeting_acl(meeting_id)
+    if acl is None:
+        return False
+    return user.id == acl['teacher_id'] or is_student(user)
+
+
+def invalidate_meeting_acl(*meeting_ids):
+    cache.delete_many([_acl_key(meeting_id) for meeting_id in meeting_ids])
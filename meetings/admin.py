@@ -3,8 +3,8 @@ from .models import Meeting
 
 @admin.register(Meeting)
 class MeetingAdmin(admin.ModelAdmin):
-    list_display = ['title', 'course', 'created_by', 'start_time', 'duration']
-    list_filter = ['course', 'created_by', 'start_time']
+    list_display = ['title', 'course', 'created_by', 'start_time', 'duration', 'media_mode']
+    list_filter = ['course', 'created_by', 'start_time', 'media_mode']
     search_fields = ['title', 'course__title', 'created_by__username']
     date_hierarchy = 'start_time'
     
@@ -0,0 +1,25 @@
+"""JSON codec for signaling frames.
+
+Uses orjson, a requirement, which is several times faster for the small
+dicts signaling is made of. It falls back to the standard library where orjson
+isn't available. Both produce compact text frames.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(obj):
+        return json.dumps(obj, separators=(',', ':'))
+
+    loads = json.loads
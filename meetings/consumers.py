@@ -1,106 +1,300 @@
-import json
-from channels.generic.websocket import AsyncWebsocketConsumer
+import asyncio
+import logging
+import time
+from collections import Counter
+from asgiref.sync import sync_to_async
+from channels.exceptions import ChannelFull
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from . import codec
+from .access import can_join_meeting, get_meeting_acl
 from .models import Meeting
+from .registry import get_registry
+from .sfu import SFU_PEER_ID, sfu_channel
+from .throttling import (
+    DISCONNECTED, LAGGING, PEER_FULL, RATE_LIMITED, TOO_LARGE, TokenBucket, record_throttled,
+)
+
+logger = logging.getLogger(__name__)
+
+# Close codes: message too big, policy violation (flooding), and our own for sockets too far behind
+CLOSE_TOO_LARGE = 1009
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_LAGGING = 4008
+
+class MeetingConsumer(AsyncJsonWebsocketConsumer):
+    @classmethod
+    async def decode_json(cls, text_data):
+        return codec.loads(text_data)
+
+    @classmethod
+    async def encode_json(cls, content):
+        return codec.dumps(content)
+
+    joined = False
 
-class MeetingConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.meeting_id = self.scope['url_route']['kwargs']['meeting_id']
         self.room_group_name = f'meeting_{self.meeting_id}'
         self.user = self.scope['user']
 
+        # Rejected before the group join, so unauthorized sockets never receive
+        # (or cost) any room traffic. The check reads the cache in a worker thread.
+        acl = await database_sync_to_async(self.get_access)()
+        if acl is None:
+            await self.close()
+            return
+        self.joined = True
+        self.media_mode = acl['media_mode']
+        self.user_id = str(self.user.id)
+        self.user_name = self.user.get_full_name() or self.user.username
+        self.registry = get_registry()
+        # ICE candidates waiting to be flushed, per addressed user
+        self.ice_batches = {}
+        self.bucket = TokenBucket(settings.MEETING_RATE_LIMIT, settings.MEETING_RATE_BURST)
+        self.throttled = Counter()
+        self.closing = False
+
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
-
         await self.accept()
 
+        # Sockets that stopped heartbeating are dropped before the snapshot is taken
+        await self.announce_departures(await self.registry.prune(self.room_group_name))
+        first_connection = await self.registry.join(
+            self.room_group_name, self.user_id, self.user_name, self.channel_name
+        )
+
+        # Send the current participants so the client can build its mesh in one step
+        participants = await self.registry.participants(self.room_group_name)
+        await self.send_json({
+            'type': 'room-state',
+            'participants': [
+                {'userId': user_id, 'userName': user_name}
+                for user_id, user_name in participants.items()
+                if user_id != self.user_id
+            ],
+            'heartbeatInterval': settings.MEETING_HEARTBEAT_INTERVAL
+        })
+
+        # Another tab of a user already in the room is not a new participant
+        if first_connection:
+            await self.announce_join()
+
     async def disconnect(self, close_code):
+        if not self.joined:
+            return
+
+        # Candidates for peers of a closing socket are of no use to anyone
+        for batch in self.ice_batches.values():
+            batch['flush'].cancel()
+        self.ice_batches = {}
+        if self.throttled:
+            logger.warning('Meeting %s socket of user %s throttled: %s', self.meeting_id, self.user_id, dict(self.throttled))
+            await sync_to_async(record_throttled)(self.throttled)
+
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-        # Notify others that user has left
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'user_left',
-                'user_id': str(self.user.id),
-                'user_name': self.user.get_full_name() or self.user.username
-            }
-        )
+        # Notify others only once the user's last socket has gone
+        departed = await self.registry.leave(self.room_group_name, self.channel_name)
+        await self.announce_departures(departed)
+        if departed and self.media_mode == Meeting.MEDIA_SFU:
+            await self.send_to_channel(sfu_channel(self.meeting_id), {
+                'type': 'sfu.leave',
+                'room': self.room_group_name,
+                'user_id': self.user_id,
+            })
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        # Size and rate are checked before decoding, so a flood costs as little as possible
+        if self.closing:
+            return
+        frame = text_data if text_data is not None else bytes_data
+        if frame is not None and len(frame) > settings.MEETING_MAX_MESSAGE_SIZE:
+            await self.drop_socket(TOO_LARGE, CLOSE_TOO_LARGE)
+            return
+        if not self.bucket.consume():
+            self.throttled[RATE_LIMITED] += 1
+            if self.throttled[RATE_LIMITED] >= settings.MEETING_MAX_DROPPED_FRAMES:
+                await self.drop_socket(DISCONNECTED, CLOSE_POLICY_VIOLATION)
+            return
+        await super().receive(text_data, bytes_data, **kwargs)
+
+    async def dispatch(self, message):
+        # Channel layer events carry the time they were queued. A socket whose client
+        # reads too slowly falls behind its room; drop it rather than let its backlog grow.
+        queued_at = message.get('queued_at')
+        if queued_at is not None:
+            if self.closing:
+                return
+            if time.time() - queued_at > settings.MEETING_MAX_QUEUE_DELAY:
+                await self.drop_socket(LAGGING, CLOSE_LAGGING)
+                return
+        await super().dispatch(message)
+
+    async def drop_socket(self, reason, code):
+        self.throttled[reason] += 1
+        self.closing = True
+        await self.close(code=code)
+
+    async def send_to_channel(self, channel, message):
+        # Channels are bounded (MEETING_CHANNEL_CAPACITY); when a peer is that far
+        # behind the message is dropped instead of failing this socket
+        message['queued_at'] = time.time()
+        try:
+            await self.channel_layer.send(channel, message)
+        except ChannelFull:
+            self.throttled[PEER_FULL] += 1
 
-    async def receive(self, text_data):
-        data = json.loads(text_data)
+    async def receive_json(self, data):
         message_type = data.get('type')
 
-        if message_type == 'join':
-            # Broadcast to others in the room that a new user joined
-            await self.channel_layer.group_send(
-                self.room_group_name,
+        if message_type == 'heartbeat':
+            if not await self.registry.heartbeat(self.room_group_name, self.channel_name):
+                # This socket was pruned (e.g. after a long stall); register it again
+                if await self.registry.join(self.room_group_name, self.user_id, self.user_name, self.channel_name):
+                    await self.announce_join()
+            await self.announce_departures(await self.registry.prune(self.room_group_name))
+        elif message_type in ['offer', 'answer', 'ice-candidate'] and data.get('to') == SFU_PEER_ID:
+            if self.media_mode != Meeting.MEDIA_SFU:
+                return
+            # Signaling for the media server goes to the worker shard owning this room
+            await self.send_to_channel(sfu_channel(self.meeting_id), {
+                'type': f"sfu.{message_type.replace('-', '_')}",
+                'room': self.room_group_name,
+                'user_id': self.user_id,
+                'user_name': self.user_name,
+                'reply_channel': self.channel_name,
+                'data': data
+            })
+        elif message_type == 'ice-candidate':
+            self.queue_ice_candidate(str(data.get('to')), data.get('candidate'))
+        elif message_type in ['offer', 'answer']:
+            # WebRTC signaling is addressed to a single peer (`to`), so it is sent
+            # straight to that peer's channel instead of every socket in the room.
+            target_channel = await self.registry.lookup(self.room_group_name, str(data.get('to')))
+            if target_channel is None:
+                return
+            # Convert hyphenated message type to underscore for handler method name
+            handler_type = message_type.replace('-', '_')
+            await self.send_to_channel(
+                target_channel,
                 {
-                    'type': 'user_joined',
-                    'user_id': str(self.user.id),
-                    'user_name': self.user.get_full_name() or self.user.username
+                    'type': handler_type,  # Use underscored version for handler method
+                    'data': data,
+                    'sender_id': self.user_id,
+                    'sender_name': self.user_name
                 }
             )
-        elif message_type in ['offer', 'answer', 'ice-candidate']:
-            # Convert hyphenated message type to underscore for handler method name
-            handler_type = message_type.replace('-', '_')
-            # Forward WebRTC signaling messages to the appropriate peer
+
+    def queue_ice_candidate(self, to, candidate):
+        # Browsers trickle candidates in bursts; those for the same peer that arrive
+        # within the batch window travel as one channel message and one frame.
+        batch = self.ice_batches.get(to)
+        if batch is None:
+            batch = self.ice_batches[to] = {'candidates': []}
+            batch['flush'] = asyncio.ensure_future(self.flush_ice_candidates(to))
+        batch['candidates'].append(candidate)
+
+    async def flush_ice_candidates(self, to):
+        await asyncio.sleep(settings.MEETING_ICE_BATCH_WINDOW / 1000)
+        batch = self.ice_batches.pop(to, None)
+        if batch is None:
+            return
+        target_channel = await self.registry.lookup(self.room_group_name, to)
+        if target_channel is None:
+            return
+        await self.send_to_channel(target_channel, {
+            'type': 'ice_candidates',
+            'candidates': batch['candidates'],
+            'sender_id': self.user_id
+        })
+
+    def get_access(self):
+        # The ACL is cached, so after the first socket into a room this is one cache read
+        if not can_join_meeting(self.user, self.meeting_id):
+            return None
+        return get_meeting_acl(self.meeting_id)
+
+    async def announce_join(self):
+        # Room-wide events are encoded once here rather than once per receiver
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'user_joined',
+                'user_id': self.user_id,
+                'queued_at': time.time(),
+                'frame': await self.encode_json({
+                    'type': 'user-joined',
+                    'userId': self.user_id,
+                    'userName': self.user_name
+                })
+            }
+        )
+
+    async def announce_departures(self, departed):
+        for user_id, user_name in departed:
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
-                    'type': handler_type,  # Use underscored version for handler method
-                    'data': data,
-                    'sender_id': str(self.user.id)
+                    'type': 'user_left',
+                    'queued_at': time.time(),
+                    'frame': await self.encode_json({
+                        'type': 'user-left',
+                        'userId': user_id,
+                        'userName': user_name
+                    })
                 }
             )
 
     async def user_joined(self, event):
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'user-joined',
-            'userId': event['user_id'],
-            'userName': event['user_name']
-        }))
+        if event['user_id'] == self.user_id:
+            return
+        await self.send(text_data=event['frame'])
 
     async def user_left(self, event):
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'user-left',
-            'userId': event['user_id'],
-            'userName': event['user_name']
-        }))
+        await self.send(text_data=event['frame'])
 
     async def offer(self, event):
-        """Forward offer to the appropriate peer"""
-        if str(self.user.id) != event['sender_id']:
-            await self.send(text_data=json.dumps({
-                'type': 'offer',
-                'sdp': event['data'].get('sdp'),
-                'from': event['sender_id']
-            }))
+        """Forward offer to the addressed peer"""
+        await self.send_json({
+            'type': 'offer',
+            'sdp': event['data'].get('sdp'),
+            'from': event['sender_id'],
+            'userName': event['sender_name'],
+            # SFU offers say which participant each forwarded track belongs to
+            'tracks': event['data'].get('tracks')
+        })
 
     async def answer(self, event):
-        """Forward answer to the appropriate peer"""
-        if str(self.user.id) != event['sender_id']:
-            await self.send(text_data=json.dumps({
-                'type': 'answer',
-                'sdp': event['data'].get('sdp'),
-                'from': event['sender_id']
-            }))
+        """Forward answer to the addressed peer"""
+        await self.send_json({
+            'type': 'answer',
+            'sdp': event['data'].get('sdp'),
+            'from': event['sender_id']
+        })
 
     async def ice_candidate(self, event):
-        """Handle ICE candidate messages"""
-        if str(self.user.id) != event['sender_id']:
-            await self.send(text_data=json.dumps({
-                'type': 'ice-candidate',  # Ensure consistent hyphenated format
-                'candidate': event['data'].get('candidate'),
-                'from': event['sender_id']
-            }))
\ No newline at end of file
+        """Forward a candidate sent on its own, e.g. by a process without batching"""
+        await self.send_json({
+            'type': 'ice-candidates',
+            'candidates': [event['data'].get('candidate')],
+            'from': event['sender_id']
+        })
+
+    async def ice_candidates(self, event):
+        """Forward a batch of ICE candidates from one peer as a single frame"""
+        await self.send_json({
+            'type': 'ice-candidates',
+            'candidates': event['candidates'],
+            'from': event['sender_id']
+        })
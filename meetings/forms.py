@@ -5,9 +5,10 @@ from .models import Meeting
 class MeetingForm(forms.ModelForm):
     class Meta:
         model = Meeting
-        fields = ['title', 'description', 'start_time']
+        fields = ['title', 'description', 'start_time', 'media_mode']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
             'start_time': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
+            'media_mode': forms.Select(attrs={'class': 'form-select'}),
         }
@@ -0,0 +1,259 @@
+"""Load simulation for the meetings WebSocket consumer.
+
+Each simulated room is joined one participant at a time, the way browsers
+arrive: the newcomer offers to everyone in its room-state snapshot, the others
+answer, and once every pair is negotiated each participant trickles ICE
+candidates to every peer. Signaling payloads carry the time they were sent, so
+the receiving client can measure end-to-end delivery latency.
+
+The same simulation drives two transports: ``CommunicatorClient`` runs the
+consumer in-process through ``WebsocketCommunicator``, and ``WebsocketClient``
+talks to a running daphne over the network (requires the ``websockets``
+package). See the ``loadtest_meetings`` management command.
+"""
+
+import asyncio
+import json
+import statistics
+import time
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from .routing import websocket_urlpatterns
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = []
+        self.received = 0
+        self.sent = 0
+        self.connections = 0
+        self.failures = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        latencies = sorted(self.latencies)
+        return {
+            'connections': self.connections,
+            'failures': self.failures,
+            'sent': self.sent,
+            'received': self.received,
+            'elapsed': elapsed,
+            'messages_per_sec': self.received / elapsed if elapsed else 0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0,
+        }
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+class CommunicatorClient:
+    """In-process client; ``user`` is placed in the scope as AuthMiddleware would."""
+
+    application = URLRouter(websocket_urlpatterns)
+
+    def __init__(self, meeting_id, user):
+        self.communicator = WebsocketCommunicator(self.application, f'/ws/meeting/{meeting_id}/')
+        self.communicator.scope['user'] = user
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect(timeout=30)
+        return connected
+
+    async def send(self, message):
+        await self.communicator.send_to(text_data=json.dumps(message))
+
+    async def receive(self):
+        return json.loads(await self.communicator.receive_from(timeout=3600))
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class WebsocketClient:
+    """Network client authenticated with an existing session cookie."""
+
+    def __init__(self, base_url, meeting_id, session_cookie):
+        self.url = f'{base_url.rstrip("/")}/ws/meeting/{meeting_id}/'
+        self.session_cookie = session_cookie
+        self.socket = None
+
+    async def connect(self):
+        from websockets.asyncio.client import connect
+        from websockets.exceptions import InvalidHandshake
+
+        try:
+            self.socket = await connect(self.url, additional_headers={'Cookie': self.session_cookie})
+        except (OSError, InvalidHandshake):
+            return False
+        return True
+
+    async def send(self, message):
+        await self.socket.send(json.dumps(message))
+
+    async def receive(self):
+        return json.loads(await self.socket.recv())
+
+    async def close(self):
+        await self.socket.close()
+
+
+class SimulatedParticipant:
+    def __init__(self, user_id, client, stats, room_size, position):
+        self.user_id = str(user_id)
+        self.client = client
+        self.stats = stats
+        # Later arrivals offer to us, we offer to (and get answers from) earlier ones
+        self.expected_offers = room_size - 1 - position
+        self.expected_answers = position
+        self.offers = self.answers = self.candidates = 0
+        self.registered = asyncio.Event()
+        self.negotiated = asyncio.Event()
+        self.done = asyncio.Event()
+        self.expected_candidates = None
+        self.tasks = []
+
+    async def send(self, message):
+        # The consumer relays the sdp/candidate object untouched, so the timestamp rides inside it
+        (message.get('sdp') or message['candidate'])['sentAt'] = time.time()
+        await self.client.send(message)
+        self.stats.sent += 1
+
+    async def join(self):
+        if not await self.client.connect():
+            self.stats.failures += 1
+            return False
+        self.stats.connections += 1
+        self.tasks.append(asyncio.ensure_future(self.read()))
+        return True
+
+    async def read(self):
+        while True:
+            message = await self.client.receive()
+            self.stats.received += 1
+            kind = message['type']
+            payloads = message.get('candidates') or [message.get('sdp')]
+            for payload in payloads:
+                if isinstance(payload, dict) and 'sentAt' in payload:
+                    self.stats.latencies.append(time.time() - payload['sentAt'])
+
+            if kind == 'room-state':
+                self.registered.set()
+                self.tasks.append(asyncio.ensure_future(self.heartbeat(message['heartbeatInterval'])))
+                for peer in message['participants']:
+                    await self.send({'type': 'offer', 'to': peer['userId'], 'sdp': _sdp('offer')})
+            elif kind == 'offer':
+                self.offers += 1
+                await self.send({'type': 'answer', 'to': message['from'], 'sdp': _sdp('answer')})
+            elif kind == 'answer':
+                self.answers += 1
+            elif kind == 'ice-candidates':
+                self.candidates += len(message['candidates'])
+            self.check_progress()
+
+    def check_progress(self):
+        if self.offers >= self.expected_offers and self.answers >= self.expected_answers:
+            self.negotiated.set()
+        if self.expected_candidates is not None and self.candidates >= self.expected_candidates:
+            self.done.set()
+
+    async def heartbeat(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await self.client.send({'type': 'heartbeat'})
+
+    async def trickle(self, peers, candidates_per_peer):
+        for n in range(candidates_per_peer):
+            for peer in peers:
+                if peer is not self:
+                    await self.send({'type': 'ice-candidate', 'to': peer.user_id, 'candidate': _candidate(n)})
+
+    async def leave(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.client.close()
+
+
+def _sdp(kind):
+    # Realistically sized (~2.5 KB) session description
+    return {'type': kind, 'sdp': 'v=0\r\n' + 'a=candidate:placeholder\r\n' * 100}
+
+
+def _candidate(n):
+    return {
+        'candidate': f'candidate:{n} 1 udp 2122260223 192.0.2.{n % 255} {50000 + n} typ host',
+        'sdpMid': '0',
+        'sdpMLineIndex': 0,
+    }
+
+
+async def simulate_room(meeting_id, participants, stats, candidates_per_peer=5, timeout=60, hold=None):
+    """Run one room: ``participants`` is a list of ``(user_id, client)`` pairs.
+
+    If ``hold`` is given the room stays connected until that event is set.
+    """
+    room = [
+        SimulatedParticipant(user_id, client, stats, len(participants), position)
+        for position, (user_id, client) in enumerate(participants)
+    ]
+    for participant in room:
+        participant.expected_candidates = candidates_per_peer * (len(room) - 1)
+    joined = []
+    try:
+        for participant in room:
+            if await participant.join():
+                joined.append(participant)
+                # The snapshot arrives once we are registered; only then may the next
+                # participant join, so everyone agrees on who offers to whom
+                await asyncio.wait_for(participant.registered.wait(), timeout)
+        await asyncio.wait_for(asyncio.gather(*(p.negotiated.wait() for p in joined)), timeout)
+        await asyncio.gather(*(p.trickle(joined, candidates_per_peer) for p in joined))
+        await asyncio.wait_for(asyncio.gather(*(p.done.wait() for p in joined)), timeout)
+        if hold:
+            await asyncio.wait_for(hold.wait(), timeout)
+    except asyncio.TimeoutError:
+        stats.failures += 1
+    finally:
+        for participant in joined:
+            await participant.leave()
+
+
+async def run_load(client_factory, meeting_ids, room_size, candidates_per_peer=5, timeout=60, on_connected=None):
+    """Simulate the meetings in ``meeting_ids`` concurrently, ``room_size`` participants each.
+
+    ``client_factory(meeting_id, index)`` returns ``(user_id, client)``.
+    ``on_connected`` is awaited once every participant is connected (rooms
+    are held open until it returns), which is the point where per-connection
+    memory is sampled.
+    """
+    stats = LoadStats()
+    all_connected = asyncio.Event()
+    total = len(meeting_ids) * room_size
+
+    async def watch_connections():
+        while stats.connections + stats.failures < total:
+            await asyncio.sleep(0.05)
+        if on_connected:
+            await on_connected(stats)
+        all_connected.set()
+
+    watcher = asyncio.ensure_future(watch_connections())
+    await asyncio.gather(*(
+        simulate_room(
+            meeting_id,
+            [client_factory(meeting_id, index) for index in range(room_size)],
+            stats, candidates_per_peer, timeout, hold=all_connected,
+        )
+        for meeting_id in meeting_ids
+    ))
+    stats.finished = time.perf_counter()
+    watcher.cancel()
+    return stats
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import socket
+import subprocess
+import time
+from contextlib import contextmanager
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from meetings.loadtest import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the ASGI stack as a single daphne process and as gunicorn/uvicorn worker '
+        'pools, and compare HTTP requests/sec and WebSocket capacity.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='*', default=[os.cpu_count()],
+                            help='gunicorn worker counts to compare against single-process daphne '
+                                 '(none: daphne only)')
+        parser.add_argument('--path', default='/auth/signin/', help='Page to request')
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--concurrency', type=int, default=64, help='Keep-alive connections')
+        parser.add_argument('--ws-rooms', type=int, default=0,
+                            help='Also run loadtest_meetings with this many rooms (needs websockets)')
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        port = options['port']
+        setups = [('daphne, 1 process', ['daphne', '-b', '127.0.0.1', '-p', str(port), 'lms.asgi:application'], {})]
+        for workers in options['workers']:
+            setups.append((
+                f'gunicorn, {workers} uvicorn workers',
+                ['gunicorn', 'lms.asgi:application', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}'],
+                {'WEB_CONCURRENCY': str(workers)},
+            ))
+
+        for label, command, env in setups:
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            with self._serve(command, env, port):
+                rps, p50, p99, errors = asyncio.run(self._http_load(
+                    port, options['path'], options['requests'], options['concurrency'],
+                ))
+                self.stdout.write(
+                    f'  HTTP {options["path"]}: {rps:.0f} req/s, p50 {p50 * 1000:.1f} ms, '
+                    f'p99 {p99 * 1000:.1f} ms, {errors} errors'
+                )
+                if options['ws_rooms']:
+                    call_command('loadtest_meetings', url=f'ws://127.0.0.1:{port}',
+                                 rooms=options['ws_rooms'], stdout=self.stdout)
+
+    @contextmanager
+    def _serve(self, command, env, port):
+        try:
+            process = subprocess.Popen(
+                command, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+        except FileNotFoundError:
+            raise CommandError(f'{command[0]} is not installed.')
+        try:
+            self._wait_for_port(process, command[0], port)
+            yield
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    def _wait_for_port(self, process, name, port):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                if process.poll() is not None:
+                    raise CommandError(f'{name} exited with code {process.returncode}.')
+                time.sleep(0.2)
+        raise CommandError(f'{name} did not start listening on port {port}.')
+
+    async def _http_load(self, port, path, total, concurrency):
+        latencies = []
+        errors = 0
+        remaining = total
+
+        async def connection():
+            nonlocal remaining, errors
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            request = f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode()
+            try:
+                while remaining > 0:
+                    remaining -= 1
+                    started = time.perf_counter()
+                    writer.write(request)
+                    status = await _read_response(reader)
+                    latencies.append(time.perf_counter() - started)
+                    if status >= 400:
+                        errors += 1
+            finally:
+                writer.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connection() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 99), errors
+
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response off a keep-alive connection; returns its status."""
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while size := int((await reader.readline()).strip(), 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    return status
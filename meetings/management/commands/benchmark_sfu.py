@@ -0,0 +1,110 @@
+import asyncio
+from django.core.management.base import BaseCommand, CommandError
+from meetings.sfu import SFURoom
+
+try:
+    from aiortc import RTCPeerConnection, RTCSessionDescription
+    from aiortc.contrib.media import MediaBlackhole
+    from aiortc.mediastreams import AudioStreamTrack, VideoStreamTrack
+except ImportError:
+    RTCPeerConnection = None
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare upload per participant for mesh and SFU meetings using headless '
+        'aiortc peers on loopback (requires aiortc).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peers', type=int, default=6, help='Participants in the room')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to stream for')
+        parser.add_argument('--modes', nargs='+', choices=['mesh', 'sfu'], default=['mesh', 'sfu'])
+
+    def handle(self, *args, **options):
+        if RTCPeerConnection is None:
+            raise CommandError('benchmark_sfu requires the aiortc package (pip install aiortc).')
+        for mode in options['modes']:
+            sent, received = asyncio.run(getattr(self, f'_run_{mode}')(options['peers'], options['duration']))
+            seconds = options['duration']
+            self.stdout.write(
+                f'{mode:>4}: {options["peers"]} peers, '
+                f'upload {sent / seconds / 1024:8.1f} KiB/s per peer, '
+                f'{received / seconds:7.1f} packets/s received per peer'
+            )
+
+    def _publish(self, pc):
+        pc.addTrack(AudioStreamTrack())
+        pc.addTrack(VideoStreamTrack())
+
+    def _consume(self, pc, sinks):
+        @pc.on('track')
+        def on_track(track):
+            # Incoming media has to be drained for the stream to keep flowing
+            sink = MediaBlackhole()
+            sink.addTrack(track)
+            sinks.append(sink)
+            asyncio.ensure_future(sink.start())
+
+    async def _totals(self, peers, duration, sinks):
+        await asyncio.sleep(duration)
+        sent = received = 0
+        for connections in peers:
+            for pc in connections:
+                for stats in (await pc.getStats()).values():
+                    if stats.type == 'outbound-rtp':
+                        sent += stats.bytesSent
+                    elif stats.type == 'inbound-rtp':
+                        received += stats.packetsReceived
+        for sink in sinks:
+            await sink.stop()
+        for connections in peers:
+            for pc in connections:
+                await pc.close()
+        return sent / len(peers), received / len(peers)
+
+    async def _run_mesh(self, count, duration):
+        # Every pair of participants holds its own connection
+        peers = [[] for _ in range(count)]
+        sinks = []
+        for i in range(count):
+            for j in range(i + 1, count):
+                offerer, answerer = RTCPeerConnection(), RTCPeerConnection()
+                for pc in (offerer, answerer):
+                    self._publish(pc)
+                    self._consume(pc, sinks)
+                await offerer.setLocalDescription(await offerer.createOffer())
+                await answerer.setRemoteDescription(offerer.localDescription)
+                await answerer.setLocalDescription(await answerer.createAnswer())
+                await offerer.setRemoteDescription(answerer.localDescription)
+                peers[i].append(offerer)
+                peers[j].append(answerer)
+        return await self._totals(peers, duration, sinks)
+
+    async def _run_sfu(self, count, duration):
+        room = SFURoom()
+        peers = []
+        sinks = []
+        for i in range(count):
+            user_id = str(i)
+            pc = RTCPeerConnection()
+            self._publish(pc)
+            self._consume(pc, sinks)
+            peers.append([pc])
+            await pc.setLocalDescription(await pc.createOffer())
+            await room.handle_offer(user_id, f'peer-{i}', self._description(pc), self._client(room, user_id, pc))
+        # Let the renegotiations triggered by late tracks settle before measuring
+        await asyncio.sleep(1)
+        return await self._totals(peers, duration, sinks)
+
+    def _client(self, room, user_id, pc):
+        async def send(message):
+            await pc.setRemoteDescription(RTCSessionDescription(**message['sdp']))
+            if message['type'] == 'offer':
+                await pc.setLocalDescription(await pc.createAnswer())
+                await room.handle_answer(user_id, self._description(pc))
+        return send
+
+    @staticmethod
+    def _description(pc):
+        return {'type': pc.localDescription.type, 'sdp': pc.localDescription.sdp}
@@ -0,0 +1,177 @@
+import asyncio
+import tracemalloc
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from authentication.roles import STUDENT
+from classmeet.models import Course
+from meetings import registry
+from meetings.models import Meeting
+from meetings.loadtest import CommunicatorClient, WebsocketClient, run_load
+from meetings.throttling import throttle_metrics
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulate concurrent meeting rooms against MeetingConsumer and report message '
+        'latency (p50/p99), throughput and memory per connection. The users, course, '
+        'rooms and sessions it creates are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=100)
+        parser.add_argument('--participants', type=int, default=4, help='Participants per room')
+        parser.add_argument('--candidates', type=int, default=5, help='ICE candidates each peer sends to each other peer')
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds a room may take per phase')
+        parser.add_argument('--layer', choices=['redis', 'memory'], default='redis',
+                            help='Channel layer for in-process runs')
+        parser.add_argument('--url', help='Run against a live server instead, e.g. ws://localhost:8000 '
+                                          '(needs the websockets package and the server\'s database and cache)')
+        parser.add_argument('--server-pid', type=int, help='With --url: daphne process to sample RSS from')
+
+    def handle(self, *args, **options):
+        # Sockets are authorized like real ones, so the run uses real rooms and students.
+        # Consumers and a --url server read them over their own connections, so they are
+        # committed and removed afterwards rather than rolled back.
+        self.created = []
+        self.clients = []
+        try:
+            options['meeting_ids'], options['students'] = self._prepare(options['rooms'], options['participants'])
+            if options['url']:
+                stats, memory = self._run_remote(options)
+            elif options['layer'] == 'memory':
+                with override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}):
+                    registry._registry = None
+                    stats, memory = self._run_local(options)
+            else:
+                stats, memory = self._run_local(options)
+        finally:
+            self._cleanup()
+
+        summary = stats.summary()
+        self.stdout.write(
+            f"{options['rooms']} rooms x {options['participants']} participants: "
+            f"{summary['connections']} connections, {summary['failures']} failures"
+        )
+        self.stdout.write(
+            f"{summary['received']} messages received in {summary['elapsed']:.2f}s "
+            f"({summary['messages_per_sec']:.0f} msg/s)"
+        )
+        self.stdout.write(
+            f"signaling latency p50 {summary['p50_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms, "
+            f"mean {summary['mean_ms']:.2f} ms"
+        )
+        if memory is not None:
+            self.stdout.write(f'memory per connection: {memory / 1024:.1f} KiB')
+        # Totals since the cache was last cleared, across every process sharing it
+        throttled = ', '.join(f'{reason} {count}' for reason, count in throttle_metrics().items())
+        self.stdout.write(f'throttling (all time): {throttled}')
+
+    def _prepare(self, rooms, participants):
+        """Create (or reuse) the rooms and student accounts the run connects with."""
+        teacher = self._get_or_create(User, username='loadtest-teacher')
+        course = self._get_or_create(
+            Course, title='Load test', teacher=teacher, defaults={'description': 'Rooms used by loadtest_meetings'},
+        )
+        meeting_ids = [
+            self._get_or_create(
+                Meeting, course=course, title=f'Load test room {n}',
+                defaults={'created_by': teacher, 'start_time': timezone.now()},
+            ).id
+            for n in range(1, rooms + 1)
+        ]
+        student_group, _ = Group.objects.get_or_create(name=STUDENT)
+        students = []
+        for n in range(1, rooms * participants + 1):
+            student = self._get_or_create(User, username=f'loadtest-{n}')
+            student.groups.add(student_group)
+            students.append(student)
+        return meeting_ids, students
+
+    def _get_or_create(self, model, **kwargs):
+        instance, created = model.objects.get_or_create(**kwargs)
+        if created:
+            self.created.append(instance)
+        return instance
+
+    def _cleanup(self):
+        """Delete the sessions and the rows this run created, newest first."""
+        for client in self.clients:
+            client.logout()
+        for instance in reversed(self.created):
+            # Deleting a user or course may already have cascaded to later rows
+            type(instance).objects.filter(pk=instance.pk).delete()
+        self.stdout.write(f'cleaned up {len(self.created)} objects and {len(self.clients)} sessions')
+
+    def _run_local(self, options):
+        positions = {meeting_id: n for n, meeting_id in enumerate(options['meeting_ids'])}
+
+        def client_factory(meeting_id, index):
+            user = options['students'][positions[meeting_id] * options['participants'] + index]
+            return user.id, CommunicatorClient(meeting_id, user)
+
+        memory = {}
+
+        async def sample(stats):
+            current, _ = tracemalloc.get_traced_memory()
+            memory['per_connection'] = (current - memory['baseline']) / max(stats.connections, 1)
+            # Tracing slows every allocation; keep it out of the latency figures
+            tracemalloc.stop()
+
+        tracemalloc.start()
+        memory['baseline'] = tracemalloc.get_traced_memory()[0]
+        stats = asyncio.run(run_load(
+            client_factory, options['meeting_ids'], options['participants'],
+            options['candidates'], options['timeout'], on_connected=sample,
+        ))
+        tracemalloc.stop()
+        return stats, memory.get('per_connection')
+
+    def _run_remote(self, options):
+        try:
+            import websockets  # noqa: F401
+        except ImportError:
+            raise CommandError('--url requires the websockets package (pip install websockets).')
+
+        sessions = self._login(options['students'])
+        positions = {meeting_id: n for n, meeting_id in enumerate(options['meeting_ids'])}
+
+        def client_factory(meeting_id, index):
+            user_id, cookie = sessions[positions[meeting_id] * options['participants'] + index]
+            return user_id, WebsocketClient(options['url'], meeting_id, cookie)
+
+        memory = {}
+
+        async def sample(stats):
+            memory['per_connection'] = (_rss(options['server_pid']) - memory['baseline']) / max(stats.connections, 1)
+
+        if options['server_pid']:
+            memory['baseline'] = _rss(options['server_pid'])
+        stats = asyncio.run(run_load(
+            client_factory, options['meeting_ids'], options['participants'], options['candidates'],
+            options['timeout'], on_connected=sample if options['server_pid'] else None,
+        ))
+        return stats, memory.get('per_connection')
+
+    def _login(self, users):
+        # Sessions are written through the configured session engine, so the server must
+        # share this database and cache
+        sessions = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            self.clients.append(client)
+            cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+            sessions.append((user.id, f'{settings.SESSION_COOKIE_NAME}={cookie}'))
+        return sessions
+
+
+def _rss(pid):
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
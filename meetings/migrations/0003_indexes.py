@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classmeet', '0002_course_thumbnail_coursematerial'),
+        ('meetings', '0002_meeting_duration'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='meeting',
+            index=models.Index(fields=['course', 'start_time'], name='meeting_course_start_idx'),
+        ),
+    ]
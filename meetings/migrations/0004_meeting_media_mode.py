@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0003_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meeting',
+            name='media_mode',
+            field=models.CharField(choices=[('mesh', 'Peer-to-peer (small groups)'), ('sfu', 'Media server relay (large groups)')], default='mesh', max_length=10),
+        ),
+    ]
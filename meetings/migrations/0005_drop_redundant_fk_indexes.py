@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classmeet', '0007_material_file_length'),
+        ('meetings', '0004_meeting_media_mode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='meeting',
+            name='course',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='meetings', to='classmeet.course'),
+        ),
+    ]
@@ -4,14 +4,28 @@ from django.contrib.auth.models import User
 from classmeet.models import Course
 
 class Meeting(models.Model):
+    MEDIA_MESH = 'mesh'
+    MEDIA_SFU = 'sfu'
+    MEDIA_MODE_CHOICES = [
+        (MEDIA_MESH, 'Peer-to-peer (small groups)'),
+        (MEDIA_SFU, 'Media server relay (large groups)'),
+    ]
+
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
-    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='meetings')
+    # meeting_course_start_idx leads with course, so the FK needs no index of its own
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='meetings', db_index=False)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='meetings_created')
     start_time = models.DateTimeField()
     duration = models.PositiveIntegerField(help_text='Duration in minutes', default=60)  # Default 1 hour
     room_name = models.CharField(max_length=255, unique=True, default=uuid.uuid4)
+    media_mode = models.CharField(max_length=10, choices=MEDIA_MODE_CHOICES, default=MEDIA_MESH)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'start_time'], name='meeting_course_start_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,208 @@
+"""Presence registry for meeting rooms.
+
+For every room it tracks which sockets are connected, which user each one
+belongs to and when it last sent a heartbeat. A user may have several sockets
+(tabs) open; they only count as having left once the last one closes or stops
+heartbeating. The registry also maps each user to a channel name so signaling
+can be addressed to a single peer.
+
+Rooms are shared by every daphne process, so the registry lives in Redis next
+to the channel layer. When the channel layer is in-memory (tests, a single dev
+process) the registry is kept in-process as well.
+"""
+
+import time
+from django.conf import settings
+import redis.asyncio as redis
+
+# KEYS: sockets (zset channel -> last heartbeat), owners (hash channel -> user),
+#       refs (hash user -> open sockets), names (hash user -> display name),
+#       peers (hash user -> channel used for signaling)
+_JOIN_SCRIPT = """
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[4], ARGV[2], ARGV[3])
+redis.call('HSET', KEYS[5], ARGV[2], ARGV[1])
+local refs = redis.call('HINCRBY', KEYS[3], ARGV[2], 1)
+for i = 1, 5 do redis.call('EXPIRE', KEYS[i], ARGV[5]) end
+return refs
+"""
+
+# ARGV[1] is an optional heartbeat cutoff: sockets seen after it are left alone,
+# which lets the same script serve explicit disconnects (no cutoff) and TTL
+# pruning. Returns a flat list of user id, name pairs whose last socket went away.
+_LEAVE_SCRIPT = """
+local departed = {}
+local cutoff = tonumber(ARGV[1])
+for i = 2, #ARGV do
+    local channel = ARGV[i]
+    local seen = redis.call('ZSCORE', KEYS[1], channel)
+    local user = redis.call('HGET', KEYS[2], channel)
+    if seen and user and (not cutoff or tonumber(seen) <= cutoff) then
+        redis.call('ZREM', KEYS[1], channel)
+        redis.call('HDEL', KEYS[2], channel)
+        local refs = redis.call('HINCRBY', KEYS[3], user, -1)
+        if refs <= 0 then
+            table.insert(departed, user)
+            table.insert(departed, redis.call('HGET', KEYS[4], user) or '')
+            redis.call('HDEL', KEYS[3], user)
+            redis.call('HDEL', KEYS[4], user)
+            redis.call('HDEL', KEYS[5], user)
+        elseif redis.call('HGET', KEYS[5], user) == channel then
+            -- Point signaling at one of the user's remaining sockets
+            local owners = redis.call('HGETALL', KEYS[2])
+            for j = 1, #owners, 2 do
+                if owners[j + 1] == user then
+                    redis.call('HSET', KEYS[5], user, owners[j])
+                    break
+                end
+            end
+        end
+    end
+end
+return departed
+"""
+
+_HEARTBEAT_SCRIPT = """
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+for i = 1, 5 do redis.call('EXPIRE', KEYS[i], ARGV[3]) end
+return 1
+"""
+
+
+def _room_keys(room):
+    return [f'meetings:{room}:{name}' for name in ('sockets', 'owners', 'refs', 'names', 'peers')]
+
+
+class RedisRoomRegistry:
+    def __init__(self, url):
+        self.client = redis.from_url(url, decode_responses=True)
+        self.join_script = self.client.register_script(_JOIN_SCRIPT)
+        self.leave_script = self.client.register_script(_LEAVE_SCRIPT)
+        self.heartbeat_script = self.client.register_script(_HEARTBEAT_SCRIPT)
+
+    def _idle_expiry(self):
+        # Room keys outlive their sockets by a margin, then Redis drops them
+        return settings.MEETING_PRESENCE_TTL * 10
+
+    async def join(self, room, user_id, user_name, channel_name):
+        """Register a socket; returns True if it is the user's first in the room."""
+        refs = await self.join_script(
+            keys=_room_keys(room),
+            args=[channel_name, user_id, user_name, time.time(), self._idle_expiry()],
+        )
+        return refs == 1
+
+    async def leave(self, room, channel_name):
+        """Drop a socket; returns ``[(user_id, user_name)]`` if its user is now gone."""
+        departed = await self.leave_script(keys=_room_keys(room), args=['', channel_name])
+        return list(zip(departed[::2], departed[1::2]))
+
+    async def heartbeat(self, room, channel_name):
+        """Refresh a socket; returns False if it had already expired."""
+        alive = await self.heartbeat_script(
+            keys=_room_keys(room),
+            args=[channel_name, time.time(), self._idle_expiry()],
+        )
+        return bool(alive)
+
+    async def prune(self, room):
+        """Expire sockets that missed their heartbeats; returns the users who left."""
+        sockets_key = _room_keys(room)[0]
+        cutoff = time.time() - settings.MEETING_PRESENCE_TTL
+        expired = await self.client.zrangebyscore(sockets_key, '-inf', cutoff)
+        if not expired:
+            return []
+        departed = await self.leave_script(keys=_room_keys(room), args=[cutoff, *expired])
+        return list(zip(departed[::2], departed[1::2]))
+
+    async def participants(self, room):
+        """Snapshot of the room as ``{user_id: user_name}``."""
+        return await self.client.hgetall(_room_keys(room)[3])
+
+    async def lookup(self, room, user_id):
+        return await self.client.hget(_room_keys(room)[4], user_id)
+
+
+class LocalRoom:
+    def __init__(self):
+        self.sockets = {}  # channel -> (user_id, last heartbeat)
+        self.names = {}
+        self.peers = {}
+
+
+class LocalRoomRegistry:
+    def __init__(self):
+        self.rooms = {}
+
+    async def join(self, room, user_id, user_name, channel_name):
+        state = self.rooms.setdefault(room, LocalRoom())
+        first = user_id not in state.names
+        state.sockets[channel_name] = (user_id, time.time())
+        state.names[user_id] = user_name
+        state.peers[user_id] = channel_name
+        return first
+
+    async def leave(self, room, channel_name, cutoff=float('inf')):
+        state = self.rooms.get(room)
+        if state is None:
+            return []
+        user_id, seen = state.sockets.get(channel_name, (None, None))
+        if user_id is None or seen > cutoff:
+            return []
+        del state.sockets[channel_name]
+        remaining = [channel for channel, (owner, _) in state.sockets.items() if owner == user_id]
+        departed = []
+        if remaining:
+            if state.peers.get(user_id) == channel_name:
+                state.peers[user_id] = remaining[0]
+        else:
+            departed.append((user_id, state.names.pop(user_id, '')))
+            state.peers.pop(user_id, None)
+        if not state.sockets:
+            del self.rooms[room]
+        return departed
+
+    async def heartbeat(self, room, channel_name):
+        state = self.rooms.get(room)
+        if state is None or channel_name not in state.sockets:
+            return False
+        user_id, _ = state.sockets[channel_name]
+        state.sockets[channel_name] = (user_id, time.time())
+        return True
+
+    async def prune(self, room):
+        state = self.rooms.get(room)
+        if state is None:
+            return []
+        cutoff = time.time() - settings.MEETING_PRESENCE_TTL
+        departed = []
+        for channel_name, (_, seen) in list(state.sockets.items()):
+            if seen <= cutoff:
+                departed += await self.leave(room, channel_name, cutoff)
+        return departed
+
+    async def participants(self, room):
+        state = self.rooms.get(room)
+        return dict(state.names) if state else {}
+
+    async def lookup(self, room, user_id):
+        state = self.rooms.get(room)
+        return state.peers.get(user_id) if state else None
+
+
+_registry = None
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        backend = settings.CHANNEL_LAYERS['default']['BACKEND']
+        if backend.endswith('InMemoryChannelLayer'):
+            _registry = LocalRoomRegistry()
+        else:
+            _registry = RedisRoomRegistry(settings.REDIS_URL)
+    return _registry
@@ -0,0 +1,284 @@
+"""Selective forwarding unit (SFU) for meetings with ``media_mode = 'sfu'``.
+
+In mesh mode every browser uploads its stream once per other participant. In
+SFU mode each browser holds a single RTCPeerConnection to the media server,
+publishes its tracks once, and the server forwards every published track to
+the other participants in the room.
+
+The relay runs in Channels worker processes started with
+``python manage.py runworker meeting-sfu-0`` (one process per shard, see
+MEETING_SFU_SHARDS). MeetingConsumer forwards signaling addressed to the
+``sfu`` peer to the room's shard; replies go straight back to the
+participant's socket. It requires the optional ``aiortc`` package.
+"""
+
+import asyncio
+import logging
+from channels.consumer import AsyncConsumer
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    from aiortc import RTCPeerConnection, RTCSessionDescription
+    from aiortc.contrib.media import MediaRelay
+    from aiortc.sdp import candidate_from_sdp
+except ImportError:  # pragma: no cover - optional dependency
+    RTCPeerConnection = None
+
+logger = logging.getLogger(__name__)
+
+# Peer id clients use to address the media server
+SFU_PEER_ID = 'sfu'
+SFU_PEER_NAME = 'Media server'
+
+# Seconds to wait for a client to answer a renegotiation offer
+NEGOTIATION_TIMEOUT = 15
+
+
+def sfu_channel_names():
+    return [f'meeting-sfu-{shard}' for shard in range(settings.MEETING_SFU_SHARDS)]
+
+
+def spawn(tasks, coroutine):
+    """Run ``coroutine`` in the background, keeping a reference in ``tasks`` until it ends.
+
+    The event loop only holds weak references to tasks, and an exception in an
+    unobserved task is otherwise never reported.
+    """
+    task = asyncio.ensure_future(coroutine)
+    tasks.add(task)
+    task.add_done_callback(lambda task: _finished(tasks, task))
+    return task
+
+
+def _finished(tasks, task):
+    tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error('SFU task failed', exc_info=task.exception())
+
+
+def sfu_channel(meeting_id):
+    # A room must always land on the same worker process, which owns its connections
+    return f'meeting-sfu-{int(meeting_id) % settings.MEETING_SFU_SHARDS}'
+
+
+class Participant:
+    def __init__(self, user_id, user_name, pc, send):
+        self.user_id = user_id
+        self.user_name = user_name
+        self.pc = pc
+        self.send = send
+        self.published = []  # tracks this participant uploads
+        self.senders = {}  # publisher user id -> senders forwarding their tracks here
+        self.owners = {}  # forwarding sender -> {'userId', 'userName'} of its publisher
+        self.negotiation = asyncio.Lock()
+        self.pending_answer = None
+        self.pending_candidates = []  # trickled before the offer was applied
+
+
+class SFURoom:
+    """Forwards every participant's published tracks to all other participants.
+
+    ``send`` callbacks receive ``{'type': 'offer'|'answer', 'sdp': {...}}``
+    messages (offers also carry ``tracks``, mapping the media section ``mid``
+    of each forwarded track to its publisher) and deliver them to the
+    participant's client.
+    """
+
+    def __init__(self):
+        if RTCPeerConnection is None:
+            raise ImproperlyConfigured('SFU media mode requires the aiortc package.')
+        self.participants = {}
+        self.relay = MediaRelay()
+        self.tasks = set()
+
+    def others(self, participant):
+        return [p for p in self.participants.values() if p is not participant]
+
+    async def handle_offer(self, user_id, user_name, sdp, send):
+        participant = self.participants.get(user_id)
+        if participant is None or participant.pc.connectionState == 'closed':
+            participant = Participant(user_id, user_name, RTCPeerConnection(), send)
+            self.participants[user_id] = participant
+            self._watch_tracks(participant)
+        participant.send = send
+
+        async with participant.negotiation:
+            await participant.pc.setRemoteDescription(RTCSessionDescription(**sdp))
+            for candidate in participant.pending_candidates:
+                await participant.pc.addIceCandidate(candidate)
+            participant.pending_candidates = []
+            answer = await participant.pc.createAnswer()
+            await participant.pc.setLocalDescription(answer)
+            await send({'type': 'answer', 'sdp': self._description(participant.pc)})
+
+        # Everything already being published reaches the newcomer in one renegotiation
+        existing = [(publisher, publisher.published) for publisher in self.others(participant) if publisher.published]
+        if existing:
+            await self.forward(participant, existing)
+
+    async def handle_answer(self, user_id, sdp):
+        participant = self.participants.get(user_id)
+        if participant is None or participant.pending_answer is None:
+            return
+        try:
+            await participant.pc.setRemoteDescription(RTCSessionDescription(**sdp))
+        except Exception:
+            # One peer's bad answer must not take the shard's other rooms down with it
+            logger.warning('SFU rejected an answer from user %s', user_id, exc_info=True)
+            return
+        if not participant.pending_answer.done():
+            participant.pending_answer.set_result(True)
+
+    async def handle_candidate(self, user_id, candidate):
+        participant = self.participants.get(user_id)
+        parsed = self._parse_candidate(candidate) if participant is not None else None
+        if parsed is None:
+            return
+        if participant.pc.remoteDescription is None:
+            participant.pending_candidates.append(parsed)
+        else:
+            try:
+                await participant.pc.addIceCandidate(parsed)
+            except Exception:
+                logger.warning('SFU rejected a candidate from user %s', user_id, exc_info=True)
+
+    @staticmethod
+    def _parse_description(data, kind):
+        # {'type': ..., 'sdp': ...} as the browser sent it, or None if it isn't one of ``kind``
+        sdp = data.get('sdp') if isinstance(data, dict) else None
+        if not isinstance(sdp, dict) or sdp.get('type') != kind or not isinstance(sdp.get('sdp'), str):
+            return None
+        return {'type': kind, 'sdp': sdp['sdp']}
+
+    @staticmethod
+    def _parse_candidate(candidate):
+        # Sent by the browser as-is, so anything malformed is dropped rather than raised
+        if not isinstance(candidate, dict) or not isinstance(candidate.get('candidate'), str):
+            return None
+        mid, index = candidate.get('sdpMid'), candidate.get('sdpMLineIndex')
+        if not isinstance(mid, (str, type(None))) or not isinstance(index, (int, type(None))):
+            return None
+        if mid is None and index is None:
+            return None
+        _, separator, sdp = candidate['candidate'].partition(':')
+        if not separator:
+            return None
+        try:
+            parsed = candidate_from_sdp(sdp)
+        except (AssertionError, IndexError, ValueError):
+            # aiortc checks the candidate's shape with assert
+            return None
+        parsed.sdpMid = mid
+        parsed.sdpMLineIndex = index
+        return parsed
+
+    async def leave(self, user_id):
+        participant = self.participants.pop(user_id, None)
+        if participant is None:
+            return
+        await participant.pc.close()
+        for other in self.participants.values():
+            for sender in other.senders.pop(user_id, []):
+                other.owners.pop(sender, None)
+                await sender.stop()
+
+    def _watch_tracks(self, publisher):
+        @publisher.pc.on('track')
+        def on_track(track):
+            publisher.published.append(track)
+            for subscriber in self.others(publisher):
+                spawn(self.tasks, self.forward(subscriber, [(publisher, [track])]))
+
+    async def forward(self, subscriber, publications):
+        """Attach ``[(publisher, tracks)]`` to the subscriber and renegotiate once."""
+        async with subscriber.negotiation:
+            if subscriber.user_id not in self.participants:
+                return
+            for publisher, tracks in publications:
+                for track in tracks:
+                    proxy = self.relay.subscribe(track)
+                    sender = subscriber.pc.addTrack(proxy)
+                    subscriber.senders.setdefault(publisher.user_id, []).append(sender)
+                    subscriber.owners[sender] = {'userId': publisher.user_id, 'userName': publisher.user_name}
+            await self._renegotiate(subscriber)
+
+    async def _renegotiate(self, subscriber):
+        offer = await subscriber.pc.createOffer()
+        await subscriber.pc.setLocalDescription(offer)
+        subscriber.pending_answer = asyncio.get_running_loop().create_future()
+        await subscriber.send({
+            'type': 'offer',
+            'sdp': self._description(subscriber.pc),
+            'tracks': {
+                transceiver.mid: subscriber.owners[transceiver.sender]
+                for transceiver in subscriber.pc.getTransceivers()
+                if transceiver.sender in subscriber.owners
+            },
+        })
+        try:
+            await asyncio.wait_for(subscriber.pending_answer, NEGOTIATION_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning('SFU renegotiation with user %s timed out', subscriber.user_id)
+        finally:
+            subscriber.pending_answer = None
+
+    @staticmethod
+    def _description(pc):
+        return {'type': pc.localDescription.type, 'sdp': pc.localDescription.sdp}
+
+
+class SFUConsumer(AsyncConsumer):
+    """Channels worker hosting the SFU rooms of one shard."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rooms = {}
+        self.tasks = set()
+
+    def get_room(self, room):
+        if room not in self.rooms:
+            self.rooms[room] = SFURoom()
+        return self.rooms[room]
+
+    def reply_to(self, channel_name):
+        async def send(message):
+            # Delivered through MeetingConsumer's regular offer/answer handlers
+            await self.channel_layer.send(channel_name, {
+                'type': message['type'],
+                'data': message,
+                'sender_id': SFU_PEER_ID,
+                'sender_name': SFU_PEER_NAME,
+            })
+        return send
+
+    # ``data`` is forwarded from the browser unchanged, so it is validated here: an
+    # exception in a handler would end this consumer and every room on the shard
+
+    async def sfu_offer(self, message):
+        sdp = SFURoom._parse_description(message['data'], 'offer')
+        if sdp is None:
+            return
+        room = self.get_room(message['room'])
+        spawn(self.tasks, room.handle_offer(
+            message['user_id'], message['user_name'], sdp, self.reply_to(message['reply_channel'])
+        ))
+
+    async def sfu_answer(self, message):
+        sdp = SFURoom._parse_description(message['data'], 'answer')
+        if sdp is None:
+            return
+        await self.get_room(message['room']).handle_answer(message['user_id'], sdp)
+
+    async def sfu_ice_candidate(self, message):
+        data = message['data']
+        candidate = data.get('candidate') if isinstance(data, dict) else None
+        await self.get_room(message['room']).handle_candidate(message['user_id'], candidate)
+
+    async def sfu_leave(self, message):
+        room = self.rooms.get(message['room'])
+        if room is None:
+            return
+        await room.leave(message['user_id'])
+        if not room.participants:
+            del self.rooms[message['room']]
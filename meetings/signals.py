@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from classmeet.models import Course
+from .access import invalidate_meeting_acl
+from .models import Meeting
+
+
+@receiver([post_save, post_delete], sender=Meeting)
+def meeting_changed(sender, instance, **kwargs):
+    invalidate_meeting_acl(instance.pk)
+
+
+@receiver(post_save, sender=Course)
+def course_changed(sender, instance, created, **kwargs):
+    # The course's teacher may have changed; deleting a course deletes its meetings
+    if not created:
+        invalidate_meeting_acl(*instance.meetings.values_list('id', flat=True))
@@ -1,12 +1,20 @@
+// Peer id of the media server in SFU meetings
+const SFU_PEER_ID = 'sfu';
+
 class Meeting {
-    constructor(meetingId, userId, userName) {
+    constructor(meetingId, userId, userName, mediaMode = 'mesh') {
         this.meetingId = meetingId;
         this.userId = userId;
         this.userName = userName;
+        this.mediaMode = mediaMode;
         this.peers = new Map();
+        // SFU mode: forwarded media section (mid) -> owner, and one stream per remote user
+        this.sfuTracks = {};
+        this.remoteStreams = new Map();
         this.localStream = null;
         this.socket = null;
         this.peerConnection = null;
+        this.heartbeatTimer = null;
 
         // DOM elements
         this.videoGrid = document.getElementById('video-grid');
@@ -67,20 +75,32 @@ class Meeting {
         };
 
         this.socket.onopen = () => {
+            // The server registers us on connect and replies with a room-state snapshot
             console.log('WebSocket connection established');
-            this.socket.send(JSON.stringify({
-                type: 'join',
-                userId: this.userId,
-                userName: this.userName
-            }));
+        };
+
+        this.socket.onclose = () => {
+            clearInterval(this.heartbeatTimer);
         };
     }
 
+    startHeartbeat(intervalSeconds) {
+        clearInterval(this.heartbeatTimer);
+        this.heartbeatTimer = setInterval(() => {
+            if (this.socket.readyState === WebSocket.OPEN) {
+                this.socket.send(JSON.stringify({ type: 'heartbeat' }));
+            }
+        }, intervalSeconds * 1000);
+    }
+
     async handleWebSocketMessage(data) {
         console.log('Received WebSocket message:', data);  // Debug log
         switch (data.type) {
+            case 'room-state':
+                await this.handleRoomState(data);
+                break;
             case 'user-joined':
-                await this.handleUserJoined(data);
+                this.handleUserJoined(data);
                 break;
             case 'user-left':
                 this.handleUserLeft(data);
@@ -91,8 +111,8 @@ class Meeting {
             case 'answer':
                 await this.handleAnswer(data);
                 break;
-            case 'ice-candidate':
-                await this.handleIceCandidate(data);
+            case 'ice-candidates':
+                await this.handleIceCandidates(data);
                 break;
             default:
                 console.log('Unknown message type:', data.type);
@@ -100,10 +120,40 @@ class Meeting {
         }
     }
 
-    async handleUserJoined(data) {
-        const userId = data.userId;  // Changed to match server's field name
-        const userName = data.userName;  // Changed to match server's field name
-        console.log(`User joined: ${userName} (${userId})`);
+    async handleRoomState(data) {
+        this.startHeartbeat(data.heartbeatInterval);
+        if (this.mediaMode === 'sfu') {
+            // One connection to the media server carries every participant's media
+            data.participants.forEach(participant => this.addParticipant(participant.userId, participant.userName));
+            await this.connectToPeer(SFU_PEER_ID, 'Media server');
+            return;
+        }
+        // As the newcomer we open a connection to everyone already in the room;
+        // they answer the offers rather than each offering to us.
+        await Promise.all(data.participants.map(
+            participant => this.connectToPeer(participant.userId, participant.userName)
+        ));
+    }
+
+    handleUserJoined(data) {
+        // The newcomer sends us an offer from its room-state snapshot
+        console.log(`User joined: ${data.userName} (${data.userId})`);
+        if (this.mediaMode === 'sfu') {
+            this.addParticipant(data.userId, data.userName);
+        }
+    }
+
+    addParticipant(userId, userName) {
+        // SFU mode lists participants without holding a connection to each
+        this.participants = this.participants || new Map();
+        this.participants.set(userId, userName);
+        this.updateParticipantsList();
+    }
+
+    async connectToPeer(userId, userName) {
+        if (this.peers.has(userId)) {
+            return;
+        }
 
         try {
             // Create a new peer connection
@@ -122,13 +172,13 @@ class Meeting {
             this.socket.send(JSON.stringify({
                 type: 'offer',
                 sdp: offer,
-                targetUserId: userId
+                to: userId
             }));
 
             // Update UI
             this.updateParticipantsList();
         } catch (error) {
-            console.error('Error handling user joined:', error);
+            console.error('Error connecting to peer:', error);
         }
     }
 
@@ -149,6 +199,10 @@ class Meeting {
             peer.connection.close();
             this.peers.delete(userId);
         }
+        this.remoteStreams.delete(userId);
+        if (this.participants) {
+            this.participants.delete(userId);
+        }
 
         // Update UI
         this.updateParticipantsList();
@@ -166,13 +220,19 @@ class Meeting {
         }];
         
         // Add remote participants
-        this.peers.forEach((peer, userId) => {
-            allParticipants.push({
-                id: userId,
-                name: peer.name,
-                isLocal: false
+        if (this.mediaMode === 'sfu') {
+            (this.participants || new Map()).forEach((name, userId) => {
+                allParticipants.push({ id: userId, name: name, isLocal: false });
             });
-        });
+        } else {
+            this.peers.forEach((peer, userId) => {
+                allParticipants.push({
+                    id: userId,
+                    name: peer.name,
+                    isLocal: false
+                });
+            });
+        }
 
         // Update the participants list HTML
         participantsList.innerHTML = allParticipants.map(participant => `
@@ -183,7 +243,7 @@ class Meeting {
         `).join('');
     }
 
-    createVideoElement(stream, userId, isLocal = false) {
+    createVideoElement(stream, userId, isLocal = false, name = null) {
         const wrapper = document.createElement('div');
         wrapper.className = 'video-wrapper';
         wrapper.id = `video-wrapper-${userId}`;
@@ -198,7 +258,7 @@ class Meeting {
         const nameTag = document.createElement('div');
         nameTag.className = 'participant-name';
         const peer = this.peers.get(userId);
-        nameTag.textContent = isLocal ? 'You' : (peer ? peer.name : 'Participant');
+        nameTag.textContent = isLocal ? 'You' : (name || (peer ? peer.name : 'Participant'));
 
         wrapper.appendChild(video);
         wrapper.appendChild(nameTag);
@@ -223,8 +283,8 @@ class Meeting {
                 console.log('New ICE candidate:', event.candidate);
                 this.socket.send(JSON.stringify({
                     type: 'ice-candidate',
-                    sdp: event.candidate,
-                    targetUserId: userId
+                    candidate: event.candidate,
+                    to: userId
                 }));
             }
         };
@@ -240,6 +300,10 @@ class Meeting {
 
         // Handle incoming streams
         peerConnection.ontrack = (event) => {
+            if (userId === SFU_PEER_ID) {
+                this.handleForwardedTrack(event.transceiver.mid, event.track);
+                return;
+            }
             const stream = event.streams[0];
             if (!document.getElementById(`video-${userId}`)) {
                 this.createVideoElement(stream, userId);
@@ -249,6 +313,26 @@ class Meeting {
         return peerConnection;
     }
 
+    handleForwardedTrack(mid, track) {
+        // The media server relays everyone's tracks over one connection;
+        // regroup them into a stream per participant using the offer's track map
+        const owner = this.sfuTracks[mid];
+        if (!owner) {
+            console.warn('Forwarded track without an owner:', mid);
+            return;
+        }
+        let stream = this.remoteStreams.get(owner.userId);
+        if (!stream) {
+            stream = new MediaStream();
+            this.remoteStreams.set(owner.userId, stream);
+        }
+        stream.addTrack(track);
+        track.onended = () => stream.removeTrack(track);
+        if (!document.getElementById(`video-${owner.userId}`)) {
+            this.createVideoElement(stream, owner.userId, false, owner.userName);
+        }
+    }
+
     // UI Event Handlers
     toggleAudio() {
         const audioTrack = this.localStream.getAudioTracks()[0];
@@ -317,6 +401,7 @@ class Meeting {
         });
 
         // Close WebSocket connection
+        clearInterval(this.heartbeatTimer);
         if (this.socket) {
             this.socket.close();
         }
@@ -340,6 +425,10 @@ class Meeting {
             }
             
             const peerConnection = this.peers.get(fromUserId).connection;
+            if (data.tracks) {
+                // Must be known before setRemoteDescription fires ontrack
+                this.sfuTracks = data.tracks;
+            }
             
             // Set remote description
             await peerConnection.setRemoteDescription(new RTCSessionDescription(data.sdp));
@@ -352,7 +441,7 @@ class Meeting {
             this.socket.send(JSON.stringify({
                 type: 'answer',
                 sdp: answer,
-                targetUserId: fromUserId
+                to: fromUserId
             }));
             
         } catch (error) {
@@ -374,17 +463,19 @@ class Meeting {
         }
     }
 
-    async handleIceCandidate(data) {
-        console.log('Received ICE candidate:', data);
-        try {
-            const fromUserId = data.from;
-            const peer = this.peers.get(fromUserId);
-            
-            if (peer && peer.connection) {
-                await peer.connection.addIceCandidate(new RTCIceCandidate(data.sdp));
+    async handleIceCandidates(data) {
+        // The server coalesces candidates trickled within a short window into one frame
+        console.log('Received ICE candidates:', data);
+        const peer = this.peers.get(data.from);
+        if (!peer || !peer.connection) {
+            return;
+        }
+        for (const candidate of data.candidates) {
+            try {
+                await peer.connection.addIceCandidate(new RTCIceCandidate(candidate));
+            } catch (error) {
+                console.error('Error handling ICE candidate:', error);
             }
-        } catch (error) {
-            console.error('Error handling ICE candidate:', error);
         }
     }
 
@@ -402,6 +493,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const meeting = new Meeting(
         meetingInfo.id,
         currentUser.id,
-        currentUser.name
+        currentUser.name,
+        meetingInfo.mediaMode
     );
 });
\ No newline at end of file
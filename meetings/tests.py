@@ -1,3 +1,375 @@
-from django.test import TestCase
+import asyncio
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from authentication.roles import STUDENT
+from classmeet.models import Course
+from lms.testing import QueryBudgetMixin, QueryPlanMixin
+from .access import _acl_key, can_join_meeting, get_meeting_acl, invalidate_meeting_acl
+from .loadtest import CommunicatorClient, run_load
+from .models import Meeting
+from .registry import get_registry
+from .throttling import throttle_metrics
+from .routing import websocket_urlpatterns
+from .sfu import Participant, RTCPeerConnection, SFUConsumer, SFURoom, spawn
 
-# Create your tests here.
+class MeetingQueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        teachers = User.objects.bulk_create(User(username=f'teacher{i}') for i in range(100))
+        courses = Course.objects.bulk_create(
+            Course(title=f'c{i}', description='text', teacher=teachers[i % 100]) for i in range(200)
+        )
+        now = timezone.now()
+        Meeting.objects.bulk_create(
+            Meeting(title=f'm{j}', course=course, created_by=course.teacher, start_time=now + timedelta(hours=j - 10))
+            for course in courses for j in range(20)
+        )
+        # A teacher's own courses, as the meeting list filters them
+        cls.courses = courses[:2]
+
+    def test_upcoming_meetings_use_index(self):
+        self.assertUsesIndex(
+            Meeting.objects.filter(course__in=self.courses, start_time__gte=timezone.now()).order_by('start_time'),
+            'meeting_course_start_idx',
+        )
+
+
+class MeetingListQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.student = User.objects.create_user(username='student')
+        cls.student.groups.add(Group.objects.get(name='Student'))
+        for i in range(5):
+            cls.teacher = User.objects.create_user(username=f'teacher{i}')
+            cls.teacher.groups.add(Group.objects.get(name='Teacher'))
+            course = Course.objects.create(title=f'c{i}', description='text', teacher=cls.teacher)
+            for j in range(6):
+                Meeting.objects.create(title=f'm{j}', course=course, created_by=cls.teacher,
+                                       start_time=now + timedelta(days=j - 3))
+
+    def test_student_meeting_list(self):
+        self.client.force_login(self.student)
+        self.assertViewWithinBudget(3, reverse('meeting_list'))
+
+    def test_teacher_meeting_list(self):
+        self.client.force_login(self.teacher)
+        self.assertViewWithinBudget(4, reverse('meeting_list'))
+
+
+class MeetingAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(username='teacher')
+        cls.other_teacher = User.objects.create_user(username='other')
+        cls.student = User.objects.create_user(username='student')
+        cls.student.groups.add(Group.objects.get(name='Student'))
+        cls.course = Course.objects.create(title='c', description='text', teacher=cls.teacher)
+        cls.meeting = Meeting.objects.create(title='m', course=cls.course, created_by=cls.teacher,
+                                             start_time=timezone.now())
+
+    def setUp(self):
+        # The cache outlives each test's rolled-back transaction
+        invalidate_meeting_acl(self.meeting.id)
+
+    def test_teacher_and_students_may_join(self):
+        self.assertTrue(can_join_meeting(self.teacher, self.meeting.id))
+        self.assertTrue(can_join_meeting(self.student, self.meeting.id))
+        self.assertFalse(can_join_meeting(self.other_teacher, self.meeting.id))
+        self.assertFalse(can_join_meeting(AnonymousUser(), self.meeting.id))
+        self.assertFalse(can_join_meeting(self.student, self.meeting.id + 100))
+
+    def test_acl_is_cached_until_the_course_changes(self):
+        get_meeting_acl(self.meeting.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_meeting_acl(self.meeting.id)['teacher_id'], self.teacher.id)
+
+        self.course.teacher = self.other_teacher
+        self.course.save()
+        self.assertTrue(can_join_meeting(self.other_teacher, self.meeting.id))
+        self.assertFalse(can_join_meeting(self.teacher, self.meeting.id))
+
+    def test_meeting_room_view_uses_the_acl(self):
+        self.client.force_login(self.other_teacher)
+        response = self.client.get(reverse('meeting_room', args=[self.meeting.id]))
+        self.assertRedirects(response, reverse('meeting_list'), fetch_redirect_response=False)
+        response = self.client.get(reverse('meeting_room', args=[self.meeting.id + 100]))
+        self.assertEqual(response.status_code, 404)
+
+
+
+def allow(user, meeting_id, media_mode=Meeting.MEDIA_MESH):
+    # Consumer tests run without a database: stand in for the cached meeting ACL
+    # and, unless a test set them, give users the student role
+    cache.set(_acl_key(meeting_id), {'teacher_id': None, 'media_mode': media_mode})
+    if not hasattr(user, '_group_names'):
+        user._group_names = frozenset({STUDENT})
+
+def connect_as(user, meeting_id, media_mode=Meeting.MEDIA_MESH):
+    allow(user, meeting_id, media_mode)
+    communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/meeting/{meeting_id}/')
+    communicator.scope['user'] = user
+    return communicator
+
+async def drain(communicator):
+    messages = []
+    while not await communicator.receive_nothing():
+        messages.append(await communicator.receive_json_from())
+    return messages
+
+class MeetingSignalingTests(SimpleTestCase):
+    async def test_unauthorized_sockets_are_rejected(self):
+        outsider = User(id=9, username='outsider')
+        outsider._group_names = frozenset()
+        for user in [AnonymousUser(), outsider]:
+            socket = connect_as(user, meeting_id=13)
+            connected, _ = await socket.connect()
+            self.assertFalse(connected)
+
+        # Malformed ids are closed like unknown meetings, without reaching the database
+        socket = connect_as(User(id=9, username='student'), meeting_id='abc')
+        connected, _ = await socket.connect()
+        self.assertFalse(connected)
+
+        teacher = User(id=9, username='teacher')
+        teacher._group_names = frozenset()
+        socket = connect_as(teacher, meeting_id=13)
+        cache.set(_acl_key(13), {'teacher_id': 9, 'media_mode': Meeting.MEDIA_MESH})
+        connected, _ = await socket.connect()
+        self.assertTrue(connected)
+        await socket.disconnect()
+
+    async def test_signaling_reaches_only_the_addressed_peer(self):
+        users = [User(id=i, username=name) for i, name in enumerate(['alice', 'bob', 'carol'], 1)]
+        alice, bob, carol = sockets = [connect_as(user, meeting_id=1) for user in users]
+        for socket in sockets:
+            connected, _ = await socket.connect()
+            self.assertTrue(connected)
+        for socket in sockets:
+            await drain(socket)
+
+        await alice.send_json_to({'type': 'offer', 'to': '2', 'sdp': {'type': 'offer', 'sdp': 'v=0'}})
+        message = await bob.receive_json_from()
+        self.assertEqual((message['type'], message['from'], message['userName']), ('offer', '1', 'alice'))
+        self.assertTrue(await carol.receive_nothing())
+        self.assertTrue(await alice.receive_nothing())
+
+        for socket in sockets:
+            await socket.disconnect()
+
+    async def test_ice_candidates_are_batched(self):
+        alice, bob = sockets = [connect_as(User(id=i, username=name), meeting_id=7) for i, name in [(1, 'alice'), (2, 'bob')]]
+        for socket in sockets:
+            await socket.connect()
+            await drain(socket)
+        await drain(alice)
+
+        for n in range(3):
+            await alice.send_json_to({'type': 'ice-candidate', 'to': '2', 'candidate': {'candidate': f'c{n}'}})
+        self.assertEqual(await drain(bob), [{
+            'type': 'ice-candidates',
+            'candidates': [{'candidate': 'c0'}, {'candidate': 'c1'}, {'candidate': 'c2'}],
+            'from': '1'
+        }])
+
+        for socket in sockets:
+            await socket.disconnect()
+
+class MeetingPresenceTests(SimpleTestCase):
+    def setUp(self):
+        self.alice = User(id=1, username='alice')
+        self.bob = User(id=2, username='bob')
+
+    async def test_snapshot_on_connect(self):
+        first = connect_as(self.alice, meeting_id=2)
+        await first.connect()
+        state = await first.receive_json_from()
+        self.assertEqual((state['type'], state['participants']), ('room-state', []))
+
+        second = connect_as(self.bob, meeting_id=2)
+        await second.connect()
+        state = await second.receive_json_from()
+        self.assertEqual(state['participants'], [{'userId': '1', 'userName': 'alice'}])
+        self.assertEqual(await drain(first), [{'type': 'user-joined', 'userId': '2', 'userName': 'bob'}])
+
+        await first.disconnect()
+        await second.disconnect()
+
+    async def test_second_tab_is_not_a_new_participant(self):
+        watcher = connect_as(self.alice, meeting_id=3)
+        await watcher.connect()
+        tab_one, tab_two = connect_as(self.bob, meeting_id=3), connect_as(self.bob, meeting_id=3)
+        await tab_one.connect()
+        await tab_two.connect()
+        self.assertEqual(len(await drain(watcher)), 2)  # room-state, one user-joined
+
+        await tab_one.disconnect()
+        self.assertEqual(await drain(watcher), [])
+        await tab_two.disconnect()
+        self.assertEqual(await drain(watcher), [{'type': 'user-left', 'userId': '2', 'userName': 'bob'}])
+
+        await watcher.disconnect()
+
+    async def test_silent_socket_expires(self):
+        watcher = connect_as(self.alice, meeting_id=4)
+        stale = connect_as(self.bob, meeting_id=4)
+        await watcher.connect()
+        await stale.connect()
+        await drain(watcher)
+
+        with override_settings(MEETING_PRESENCE_TTL=0):
+            await watcher.send_json_to({'type': 'heartbeat'})
+            messages = await drain(watcher)
+        self.assertIn({'type': 'user-left', 'userId': '2', 'userName': 'bob'}, messages)
+
+        await watcher.disconnect()
+        await stale.disconnect()
+
+class MeetingSFURoutingTests(SimpleTestCase):
+    async def test_media_server_signaling_goes_to_the_room_shard(self):
+        alice = connect_as(User(id=1, username='alice'), meeting_id=5, media_mode=Meeting.MEDIA_SFU)
+        await alice.connect()
+        await drain(alice)
+        await alice.send_json_to({'type': 'offer', 'to': 'sfu', 'sdp': {'type': 'offer', 'sdp': 'v=0'}})
+        message = await get_channel_layer().receive('meeting-sfu-0')
+        self.assertEqual(message['type'], 'sfu.offer')
+        self.assertEqual((message['room'], message['user_id']), ('meeting_5', '1'))
+        self.assertEqual(message['data']['sdp'], {'type': 'offer', 'sdp': 'v=0'})
+
+        # The relay drops the participant's connection when they leave the room
+        await alice.disconnect()
+        message = await get_channel_layer().receive('meeting-sfu-0')
+        self.assertEqual((message['type'], message['user_id']), ('sfu.leave', '1'))
+
+    async def test_mesh_meeting_ignores_media_server(self):
+        alice = connect_as(User(id=1, username='alice'), meeting_id=6)
+        await alice.connect()
+        await drain(alice)
+        await alice.send_json_to({'type': 'offer', 'to': 'sfu', 'sdp': {}})
+        self.assertTrue(await alice.receive_nothing())
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(get_channel_layer().receive('meeting-sfu-0'), 0.1)
+
+        await alice.disconnect()
+
+class SFUTaskTests(SimpleTestCase):
+    async def test_background_failures_are_logged_and_released(self):
+        async def fail():
+            raise RuntimeError('renegotiation failed')
+
+        tasks = set()
+        with self.assertLogs('meetings.sfu', 'ERROR') as logs:
+            task = spawn(tasks, fail())
+            self.assertEqual(tasks, {task})
+            await asyncio.gather(task, return_exceptions=True)
+            await asyncio.sleep(0)
+        self.assertEqual(tasks, set())
+        self.assertIn('renegotiation failed', logs.output[0])
+
+    def test_shards_do_not_share_rooms(self):
+        self.assertIsNot(SFUConsumer().rooms, SFUConsumer().rooms)
+
+    @skipUnless(RTCPeerConnection, 'aiortc is not installed')
+    def test_malformed_candidates_are_dropped(self):
+        valid = 'candidate:1 1 udp 2122260223 192.0.2.1 54400 typ host'
+        self.assertIsNotNone(SFURoom._parse_candidate({'candidate': valid, 'sdpMLineIndex': 0}))
+        for candidate in [None, 'x', {'candidate': 'nocolon'}, {'candidate': 'candidate:1 1'},
+                          {'candidate': valid, 'sdpMLineIndex': 'zero'}, {'candidate': 7}, {'candidate': valid}]:
+            self.assertIsNone(SFURoom._parse_candidate(candidate))
+
+    @skipUnless(RTCPeerConnection, 'aiortc is not installed')
+    async def test_malformed_signaling_is_contained(self):
+        consumer = SFUConsumer()
+        for data in [None, 'x', {}, {'sdp': 'x'}, {'sdp': {'type': 'offer'}}, {'sdp': {'type': 'answer', 'sdp': 7}}]:
+            message = {'room': 'r', 'user_id': 1, 'user_name': 'a', 'reply_channel': 'c', 'data': data}
+            await consumer.sfu_offer(message)
+            await consumer.sfu_answer(message)
+            await consumer.sfu_ice_candidate(message)
+        self.assertEqual(consumer.tasks, set())
+
+        # A garbage answer to a renegotiation is logged; the peer keeps waiting for a real one
+        room = consumer.get_room('r')
+        participant = room.participants[1] = Participant(1, 'a', RTCPeerConnection(), None)
+        participant.pending_answer = asyncio.get_running_loop().create_future()
+        with self.assertLogs('meetings.sfu', 'WARNING'):
+            await room.handle_answer(1, {'type': 'answer', 'sdp': 'garbage'})
+        self.assertFalse(participant.pending_answer.done())
+        await participant.pc.close()
+
+class MeetingLoadHarnessTests(SimpleTestCase):
+    async def test_every_signaling_message_is_delivered(self):
+        def client_factory(meeting_id, index):
+            user_id = 100 + meeting_id * 10 + index
+            user = User(id=user_id, username=f'load-{user_id}')
+            allow(user, meeting_id)
+            return user_id, CommunicatorClient(meeting_id, user)
+
+        stats = await run_load(client_factory, [11, 12], room_size=3, candidates_per_peer=2, timeout=10)
+        # Per room: 3 offers + 3 answers + 3 * 2 peers * 2 candidates
+        self.assertEqual((stats.connections, stats.failures), (6, 0))
+        self.assertEqual(len(stats.latencies), 2 * (3 + 3 + 12))
+        self.assertGreater(stats.summary()['p99_ms'], 0)
+
+class LoadtestCommandTests(TransactionTestCase):
+    serialized_rollback = True
+
+    def test_created_rows_are_removed(self):
+        existing = User.objects.create_user(username='loadtest-1')
+        out = StringIO()
+        call_command('loadtest_meetings', rooms=1, participants=2, candidates=1, layer='memory', stdout=out)
+        self.assertIn('2 connections, 0 failures', out.getvalue())
+        self.assertQuerySetEqual(User.objects.filter(username__startswith='loadtest-'), [existing])
+        self.assertFalse(Course.objects.filter(title='Load test').exists())
+
+class MeetingThrottlingTests(SimpleTestCase):
+    async def connect(self, meeting_id):
+        socket = connect_as(User(id=1, username='alice'), meeting_id=meeting_id)
+        await socket.connect()
+        await drain(socket)
+        return socket
+
+    async def test_oversized_frame_closes_the_socket(self):
+        with override_settings(MEETING_MAX_MESSAGE_SIZE=100):
+            socket = await self.connect(meeting_id=8)
+            await socket.send_json_to({'type': 'offer', 'to': '2', 'sdp': {'sdp': 'x' * 200}})
+            self.assertEqual(await socket.receive_output(), {'type': 'websocket.close', 'code': 1009})
+        with self.assertLogs('meetings.consumers', 'WARNING'):
+            await socket.disconnect()
+
+    async def test_flooding_socket_is_dropped_and_counted(self):
+        before = await sync_to_async(throttle_metrics)()
+        with override_settings(MEETING_RATE_LIMIT=1, MEETING_RATE_BURST=2, MEETING_MAX_DROPPED_FRAMES=3):
+            socket = await self.connect(meeting_id=9)
+            for _ in range(5):
+                await socket.send_json_to({'type': 'offer', 'to': '2', 'sdp': {}})
+            self.assertEqual(await socket.receive_output(), {'type': 'websocket.close', 'code': 1008})
+        with self.assertLogs('meetings.consumers', 'WARNING'):
+            await socket.disconnect()
+
+        after = await sync_to_async(throttle_metrics)()
+        self.assertEqual(after['rate_limited'] - before['rate_limited'], 3)
+        self.assertEqual(after['disconnected'] - before['disconnected'], 1)
+
+    async def test_lagging_socket_is_dropped(self):
+        socket = await self.connect(meeting_id=10)
+        channel = await get_registry().lookup('meeting_10', '1')
+        await get_channel_layer().send(channel, {
+            'type': 'user_left',
+            'frame': '{}',
+            'queued_at': time.time() - 60,
+        })
+        self.assertEqual(await socket.receive_output(), {'type': 'websocket.close', 'code': 4008})
+        with self.assertLogs('meetings.consumers', 'WARNING'):
+            await socket.disconnect()
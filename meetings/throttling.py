@@ -0,0 +1,50 @@
+"""Flood protection for meeting sockets.
+
+Every socket gets a token bucket: frames over the rate are dropped, and a
+socket that keeps flooding is disconnected. Throttling events are counted per
+socket and added to shared counters in the cache when it closes, so the
+totals cover every daphne process.
+"""
+
+import time
+from django.core.cache import cache
+
+METRICS_KEY = 'meetings:throttled:{reason}'
+
+# Why a frame was dropped or a socket closed
+RATE_LIMITED = 'rate_limited'
+TOO_LARGE = 'too_large'
+PEER_FULL = 'peer_full'
+LAGGING = 'lagging'
+DISCONNECTED = 'disconnected'
+REASONS = [RATE_LIMITED, TOO_LARGE, PEER_FULL, LAGGING, DISCONNECTED]
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def consume(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def record_throttled(counts):
+    for reason, count in counts.items():
+        key = METRICS_KEY.format(reason=reason)
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, count)
+
+
+def throttle_metrics():
+    keys = {METRICS_KEY.format(reason=reason): reason for reason in REASONS}
+    values = cache.get_many(keys)
+    return {reason: values.get(key, 0) for key, reason in keys.items()}
@@ -1,8 +1,14 @@
+import asyncio
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.http import Http404
+from authentication.decorators import async_user
+from authentication.roles import ais_teacher
 from classmeet.views import teacher_required
 from classmeet.models import Course
+from .access import can_join_meeting, get_meeting_acl
 from .models import Meeting
 from .forms import MeetingForm
 from .tasks import send_meeting_notification
@@ -32,40 +38,44 @@ def schedule_meeting(request, course_id):
 
 @login_required
 def meeting_room(request, meeting_id):
-    meeting = get_object_or_404(Meeting, id=meeting_id)
-    # Ensure only enrolled students or teacher can join
-    
-    if not request.user.groups.filter(name='Student').exists() and not (request.user == meeting.course.teacher):
+    # The same cached check guards the room's WebSocket
+    if get_meeting_acl(meeting_id) is None:
+        raise Http404('No meeting matches the given query.')
+    if not can_join_meeting(request.user, meeting_id):
         return redirect('meeting_list')
+    meeting = get_object_or_404(Meeting.objects.select_related('course'), id=meeting_id)
     return render(request, 'meetings/meeting_room.html', {
         'meeting': meeting,
         'user_name': request.user.first_name or request.user.username
     })
 
 @login_required
-def meeting_list(request):
+@async_user
+async def meeting_list(request):
     current_time = timezone.now()
+    user_is_teacher = await ais_teacher(request.user)
     # Get the user's courses
-    if request.user.groups.filter(name='Teacher').exists():
+    if user_is_teacher:
         courses = Course.objects.filter(teacher=request.user)
     else:
         # For students, get courses they're enrolled in
         courses = Course.objects.all()
 
     # Get meetings for these courses
-    upcoming_meetings = Meeting.objects.filter(
-        course__in=courses,
-        start_time__gte=current_time
-    ).order_by('start_time')
-    
-    past_meetings = Meeting.objects.filter(
-        course__in=courses,
-        start_time__lt=current_time
-    ).order_by('-start_time')
+    meetings = Meeting.objects.filter(course__in=courses).select_related('course', 'created_by')
+    upcoming_meetings, past_meetings, courses = await asyncio.gather(
+        _alist(meetings.filter(start_time__gte=current_time).order_by('start_time')),
+        _alist(meetings.filter(start_time__lt=current_time).order_by('-start_time')),
+        # Only teachers get the schedule dropdown
+        _alist(courses) if user_is_teacher else _alist(courses.none()),
+    )
 
-    return render(request, 'meetings/meeting_list.html', {
+    return await sync_to_async(render)(request, 'meetings/meeting_list.html', {
         'upcoming_meetings': upcoming_meetings,
         'past_meetings': past_meetings,
-        'is_teacher': request.user.groups.filter(name='Teacher').exists(),
+        'is_teacher': user_is_teacher,
         'courses': courses  # Pass courses to template for the schedule meeting dropdown
-    })
\ No newline at end of file
+    })
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
@@ -1,8 +1,14 @@
 from django.contrib import admin
-from .models import Notification
+from .models import Broadcast, Notification
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('recipient', 'sender', 'message', 'read', 'created_at')
     list_filter = ('read', 'created_at')
-    search_fields = ('recipient__username', 'sender__username', 'message')
\ No newline at end of file
+    search_fields = ('recipient__username', 'sender__username', 'message')
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('sender', 'message', 'audience', 'created_at')
+    list_filter = ('audience', 'created_at')
+    search_fields = ('sender__username', 'message')
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.cache import cache
+from .models import Broadcast, Notification
+
+BROADCAST_VERSION_KEY = 'notifications:broadcast_version'
+
+
+def _broadcast_version():
+    return cache.get_or_set(BROADCAST_VERSION_KEY, 1, timeout=None)
+
+
+def _summary_key(user_id, version=None):
+    # Broadcasts are shared by every user, so instead of deleting one key per
+    # user when a broadcast is sent, each summary key embeds a global version.
+    return f'notifications:unread:{user_id}:{version or _broadcast_version()}'
+
+
+def _preview_item(item):
+    return {
+        'message': item.message,
+        'created_at': item.created_at,
+        'url': item.get_read_url(),
+    }
+
+
+def get_unread_summary(user):
+    """Return ``{'count': int, 'preview': [...]}`` for the user's unread items.
+
+    The preview holds at most NOTIFICATION_PREVIEW_LIMIT entries, newest first.
+    """
+    key = _summary_key(user.id)
+    summary = cache.get(key)
+    if summary is None:
+        limit = settings.NOTIFICATION_PREVIEW_LIMIT
+        personal = Notification.objects.filter(recipient=user, read=False)
+        broadcasts = Broadcast.objects.unread_by(user)
+        latest = sorted(
+            [*personal[:limit], *broadcasts[:limit]],
+            key=lambda item: item.created_at,
+            reverse=True,
+        )[:limit]
+        summary = {
+            'count': personal.count() + broadcasts.count(),
+            'preview': [_preview_item(item) for item in latest],
+        }
+        cache.set(key, summary, settings.NOTIFICATION_CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate_user(user_id):
+    cache.delete(_summary_key(user_id))
+
+
+def invalidate_broadcasts():
+    try:
+        cache.incr(BROADCAST_VERSION_KEY)
+    except ValueError:
+        # Version key expired or was never set; start a fresh generation
+        cache.set(BROADCAST_VERSION_KEY, 2, timeout=None)
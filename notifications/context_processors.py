@@ -1,8 +1,12 @@
 
-from .models import Notification
+from .cache import get_unread_summary
 
 def notifications(request):
     if request.user.is_authenticated:
-        unread_notifications = Notification.objects.filter(recipient=request.user, read=False)
-        return {'unread_notifications': unread_notifications}
+        # Served from the per-user cache; see notifications.cache for invalidation
+        summary = get_unread_summary(request.user)
+        return {
+            'unread_notification_count': summary['count'],
+            'unread_notifications': summary['preview'],
+        }
     return {}
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussions', '0002_indexes'),
+        ('meetings', '0003_indexes'),
+        ('notifications', '0003_broadcast'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='broadcast',
+            index=models.Index(fields=['audience', '-created_at'], name='broadcast_audience_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='broadcastread',
+            index=models.Index(fields=['user', 'broadcast'], name='broadcast_read_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('read', False)), fields=['recipient', '-created_at'], name='notification_unread_idx'),
+        ),
+    ]
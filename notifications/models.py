@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.urls import reverse
+from authentication.roles import is_teacher
 from discussions.models import Discussion
 
 class Notification(models.Model):
@@ -7,11 +9,104 @@ class Notification(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_notifications')
     message = models.TextField()
     discussion = models.ForeignKey(Discussion, on_delete=models.CASCADE, null=True, blank=True)
+    meeting = models.ForeignKey('meetings.Meeting', on_delete=models.CASCADE, null=True, blank=True)
     read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f'Notification for {self.recipient.username}'
 
+    def get_read_url(self):
+        return reverse('mark_notification_as_read', args=[self.id])
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Unread badge and dropdown: only unread rows are ever looked up by recipient
+            models.Index(
+                fields=['recipient', '-created_at'],
+                condition=models.Q(read=False),
+                name='notification_unread_idx',
+            ),
+        ]
+        constraints = [
+            # One meeting-start notification per recipient, so task retries are safe
+            models.UniqueConstraint(
+                fields=['recipient', 'meeting'],
+                condition=models.Q(meeting__isnull=False),
+                name='unique_meeting_notification_per_recipient',
+            ),
+        ]
+
+class BroadcastQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        audiences = [Broadcast.AUDIENCE_ALL]
+        if not is_teacher(user):
+            audiences.append(Broadcast.AUDIENCE_STUDENTS)
+        return self.filter(
+            audience__in=audiences,
+            created_at__gte=user.date_joined,
+        ).exclude(sender=user)
+
+    def unread_by(self, user):
+        return self.visible_to(user).exclude(reads__user=user)
+
+class Broadcast(models.Model):
+    """A notification addressed to a whole audience, stored once per event.
+
+    Per-user state lives in BroadcastRead, so writes scale with events rather
+    than with the number of users.
+    """
+    AUDIENCE_ALL = 'all'
+    AUDIENCE_STUDENTS = 'students'
+    AUDIENCE_CHOICES = [
+        (AUDIENCE_ALL, 'All users'),
+        (AUDIENCE_STUDENTS, 'Students'),
+    ]
+
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_broadcasts')
+    message = models.TextField()
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES, default=AUDIENCE_ALL)
+    discussion = models.ForeignKey(Discussion, on_delete=models.CASCADE, null=True, blank=True)
+    meeting = models.ForeignKey('meetings.Meeting', on_delete=models.CASCADE, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = BroadcastQuerySet.as_manager()
+
+    def __str__(self):
+        return f'Broadcast to {self.get_audience_display()}: {self.message[:50]}'
+
+    def get_read_url(self):
+        return reverse('mark_broadcast_as_read', args=[self.id])
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['audience', '-created_at'], name='broadcast_audience_idx'),
+        ]
+        constraints = [
+            # One meeting-start broadcast per meeting, so task retries are safe
+            models.UniqueConstraint(
+                fields=['meeting'],
+                condition=models.Q(meeting__isnull=False),
+                name='unique_broadcast_per_meeting',
+            ),
+        ]
+
+class BroadcastRead(models.Model):
+    # Both lookups are served by the composite indexes below, which lead with each column
+    broadcast = models.ForeignKey(Broadcast, on_delete=models.CASCADE, related_name='reads', db_index=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcast_reads', db_index=False)
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.user.username} read broadcast {self.broadcast_id}'
+
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        indexes = [
+            # Unread broadcasts are resolved per user; the unique constraint leads with broadcast
+            models.Index(fields=['user', 'broadcast'], name='broadcast_read_user_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['broadcast', 'user'], name='unique_broadcast_read'),
+        ]
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import invalidate_broadcasts, invalidate_user
+from .models import Broadcast, BroadcastRead, Notification
+
+
+@receiver([post_save, post_delete], sender=Notification)
+def notification_changed(sender, instance, **kwargs):
+    invalidate_user(instance.recipient_id)
+
+
+@receiver([post_save, post_delete], sender=Broadcast)
+def broadcast_changed(sender, instance, **kwargs):
+    invalidate_broadcasts()
+
+
+@receiver([post_save, post_delete], sender=BroadcastRead)
+def broadcast_read_changed(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
@@ -1,3 +1,145 @@
+from datetime import timedelta
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from lms.testing import QueryPlanMixin
+from .cache import get_unread_summary
+from .models import Broadcast, BroadcastRead, Notification
 
-# Create your tests here.
+class NotificationQueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sender = User.objects.create_user(username='sender')
+        users = User.objects.bulk_create(
+            User(username=f'reader{i}', date_joined=timezone.now() - timedelta(days=30)) for i in range(200)
+        )
+        cls.user = users[0]
+        cls.user.groups.add(Group.objects.get(name='Student'))
+        # Most notifications have been read; only unread ones are looked up
+        Notification.objects.bulk_create(
+            Notification(recipient=user, sender=cls.sender, message=f'n{i}', read=i % 20 != 0)
+            for user in users[:5] for i in range(1000)
+        )
+        # A long history of broadcasts, of which a user only sees those since joining
+        broadcasts = Broadcast.objects.bulk_create(
+            Broadcast(sender=cls.sender, message=f'b{i}') for i in range(1000)
+        )
+        for i, broadcast in enumerate(broadcasts):
+            broadcast.created_at = timezone.now() - timedelta(hours=8 * i)
+        Broadcast.objects.bulk_update(broadcasts, ['created_at'])
+        BroadcastRead.objects.bulk_create(
+            BroadcastRead(broadcast=broadcast, user=user)
+            for user in users for broadcast in broadcasts[:100] if broadcast.pk % 2
+        )
+
+    def test_unread_notifications_use_index(self):
+        self.assertUsesIndex(Notification.objects.filter(recipient=self.user, read=False)[:10], 'notification_unread_idx')
+
+    def test_broadcast_reads_use_index(self):
+        self.assertUsesIndex(BroadcastRead.objects.filter(user=self.user), 'broadcast_read_user_idx')
+
+    def test_unread_broadcasts_use_index(self):
+        self.assertUsesIndex(Broadcast.objects.unread_by(self.user)[:10], 'broadcast_audience_idx')
+
+def create_user(username, role, joined):
+    user = User.objects.create_user(username=username, date_joined=joined)
+    user.groups.add(Group.objects.get(name=role))
+    return user
+
+class BroadcastAudienceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        joined = timezone.now() - timedelta(days=1)
+        cls.sender = create_user('sender', 'Teacher', joined)
+        cls.teacher = create_user('teacher', 'Teacher', joined)
+        cls.student = create_user('student', 'Student', joined)
+        cls.everyone = Broadcast.objects.create(sender=cls.sender, message='Welcome')
+        cls.students = Broadcast.objects.create(sender=cls.sender, message='Quiz', audience=Broadcast.AUDIENCE_STUDENTS)
+        # Joined after both broadcasts were sent
+        cls.newcomer = create_user('newcomer', 'Student', timezone.now() + timedelta(seconds=1))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_students_see_every_audience(self):
+        self.assertCountEqual(Broadcast.objects.visible_to(self.student), [self.everyone, self.students])
+
+    def test_teachers_see_broadcasts_to_all(self):
+        self.assertCountEqual(Broadcast.objects.visible_to(self.teacher), [self.everyone])
+
+    def test_senders_do_not_see_their_own(self):
+        self.assertFalse(Broadcast.objects.visible_to(self.sender).exists())
+
+    def test_later_joiners_miss_earlier_broadcasts(self):
+        self.assertFalse(Broadcast.objects.visible_to(self.newcomer).exists())
+
+    def test_read_broadcasts_are_not_unread(self):
+        BroadcastRead.objects.create(broadcast=self.students, user=self.student)
+        self.assertCountEqual(Broadcast.objects.unread_by(self.student), [self.everyone])
+        self.assertCountEqual(Broadcast.objects.unread_by(self.teacher), [self.everyone])
+
+    def test_mark_as_read_is_idempotent(self):
+        self.client.force_login(self.student)
+        url = reverse('mark_broadcast_as_read', args=[self.students.id])
+        for _ in range(2):
+            self.assertRedirects(self.client.get(url), reverse('dashboard'), fetch_redirect_response=False)
+        self.assertEqual(BroadcastRead.objects.filter(broadcast=self.students, user=self.student).count(), 1)
+
+    def test_invisible_broadcasts_cannot_be_marked(self):
+        for user in [self.teacher, self.newcomer]:
+            self.client.force_login(user)
+            response = self.client.get(reverse('mark_broadcast_as_read', args=[self.students.id]))
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(BroadcastRead.objects.exists())
+
+    def test_badge_merges_notifications_and_broadcasts(self):
+        Notification.objects.create(recipient=self.student, sender=self.sender, message='Graded')
+        Notification.objects.create(recipient=self.student, sender=self.sender, message='Old', read=True)
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['unread_notification_count'], 3)
+        self.assertEqual(
+            [item['message'] for item in response.context['unread_notifications']], ['Graded', 'Quiz', 'Welcome'],
+        )
+
+class UnreadSummaryCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        joined = timezone.now() - timedelta(days=1)
+        cls.sender = create_user('sender', 'Teacher', joined)
+        cls.student = create_user('student', 'Student', joined)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertRecomputed(self, count):
+        # A cached summary is served without queries; a recomputed one needs several
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_unread_summary(self.student)['count'], count)
+        self.assertTrue(queries.captured_queries, 'Stale summary served from the cache')
+
+    def test_summary_is_cached(self):
+        self.assertRecomputed(0)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_summary(self.student)['count'], 0)
+
+    def test_notifications_invalidate_their_recipient(self):
+        self.assertRecomputed(0)
+        notification = Notification.objects.create(recipient=self.student, sender=self.sender, message='Graded')
+        self.assertRecomputed(1)
+        notification.read = True
+        notification.save()
+        self.assertRecomputed(0)
+
+    def test_broadcasts_invalidate_everyone(self):
+        self.assertRecomputed(0)
+        broadcast = Broadcast.objects.create(sender=self.sender, message='Welcome')
+        self.assertRecomputed(1)
+        BroadcastRead.objects.create(broadcast=broadcast, user=self.student)
+        self.assertRecomputed(0)
+        broadcast.delete()
+        self.assertRecomputed(0)
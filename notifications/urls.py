@@ -4,4 +4,5 @@ from . import views
 
 urlpatterns = [
     path('<int:notification_id>/read/', views.mark_notification_as_read, name='mark_notification_as_read'),
+    path('broadcast/<int:broadcast_id>/read/', views.mark_broadcast_as_read, name='mark_broadcast_as_read'),
 ]
@@ -1,15 +1,25 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Notification
+from .models import Broadcast, BroadcastRead, Notification
+
+def _redirect_to_target(item):
+    if item.discussion_id:
+        return redirect('discussion_detail', discussion_id=item.discussion_id)
+    elif item.meeting_id:
+        return redirect('meeting_room', meeting_id=item.meeting_id)
+    else:
+        # If there's no discussion associated, redirect to a default page like the dashboard
+        return redirect('dashboard')
 
 @login_required
 def mark_notification_as_read(request, notification_id):
     notification = get_object_or_404(Notification, id=notification_id, recipient=request.user)
     notification.read = True
     notification.save()
+    return _redirect_to_target(notification)
 
-    if notification.discussion:
-        return redirect('discussion_detail', discussion_id=notification.discussion.id)
-    else:
-        # If there's no discussion associated, redirect to a default page like the dashboard
-        return redirect('dashboard')
\ No newline at end of file
+@login_required
+def mark_broadcast_as_read(request, broadcast_id):
+    broadcast = get_object_or_404(Broadcast.objects.visible_to(request.user), id=broadcast_id)
+    BroadcastRead.objects.get_or_create(broadcast=broadcast, user=request.user)
+    return _redirect_to_target(broadcast)
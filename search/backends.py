@@ -0,0 +1,117 @@
+"""Full-text queries against the index created by search's migration.
+
+On PostgreSQL documents match a ``websearch_to_tsquery`` (quoted phrases,
+``or`` and ``-word`` work as on web search engines) against the generated,
+GIN-indexed ``search_vector`` column and are ordered by ``ts_rank``. SQLite
+(local development) uses its FTS5 table with ``bm25``. Both weight titles
+above bodies. Other databases fall back to unranked ``icontains``.
+
+Ranking has to score every matching row, so a common word could make one
+query rank most of the table. By default only the newest SEARCH_MAX_CANDIDATES
+matches are ranked. That is a deliberate trade-off: for a word with more
+matches, an older and better match is left out, and the page is marked
+``truncated`` so the results template can ask for a more specific query.
+Setting SEARCH_MAX_CANDIDATES to 0 ranks every match instead, at a cost that
+grows with the number of matches.
+"""
+
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q, Window
+from django.db.models.expressions import RawSQL
+from .models import SearchDocument
+
+FTS_TABLE = 'search_searchdocument_fts'
+
+# bm25() column weights for (title, body)
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+
+class SearchPage:
+    def __init__(self, object_list, number, has_next, truncated=False):
+        self.object_list = object_list
+        self.number = number
+        self.has_next = has_next
+        self.has_previous = number > 1
+        # Only the newest SEARCH_MAX_CANDIDATES matches were ranked
+        self.truncated = truncated
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def search(text, page=1, per_page=None):
+    """Return one page of documents matching ``text``, best match first."""
+    per_page = per_page or settings.SEARCH_RESULTS_PER_PAGE
+    page = max(page, 1)
+    offset = (page - 1) * per_page
+    text = text.strip()
+    if not text:
+        return SearchPage([], page, False)
+
+    if connection.vendor == 'postgresql':
+        rows, truncated = _postgres(text, offset, per_page + 1)
+    elif connection.vendor == 'sqlite':
+        rows, truncated = _sqlite(text, offset, per_page + 1)
+    else:
+        rows, truncated = _fallback(text, offset, per_page + 1), False
+    return SearchPage(rows[:per_page], page, len(rows) > per_page, truncated)
+
+
+def _postgres(text, offset, limit):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+    vector = RawSQL('search_vector', [], output_field=SearchVectorField())
+    query = SearchQuery(text, search_type='websearch', config='english')
+    cap = settings.SEARCH_MAX_CANDIDATES
+    matches = SearchDocument.objects.annotate(vector=vector).filter(vector=query)
+    if cap:
+        matches = SearchDocument.objects.filter(pk__in=matches.order_by('-pk').values('pk')[:cap])
+    rows = list(
+        matches.annotate(rank=SearchRank(vector, query), ranked=Window(Count('pk')))
+        .order_by('-rank', '-pk')[offset:offset + limit]
+    )
+    return rows, bool(cap and rows and rows[0].ranked >= cap)
+
+
+def _sqlite(text, offset, limit):
+    # Quoting each word keeps FTS5 query syntax (AND, NEAR, column:...) out of user input
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return [], False
+    match = ' '.join(f'"{term}"' for term in terms)
+    cap = settings.SEARCH_MAX_CANDIDATES
+    # The candidate cap is a rowid lower bound: SQLite reruns an ``IN (...)``
+    # subquery over the FTS table per row
+    newest, params = '', [match]
+    if cap:
+        newest = (
+            f'AND rowid >= (SELECT min(rowid) FROM ('
+            f'  SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s'
+            f'))'
+        )
+        params += [match, cap]
+    # bm25() can't be used alongside a window function, hence the subquery
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, count(*) OVER () FROM ('
+            f'  SELECT rowid, bm25({FTS_TABLE}, %s, %s) AS score FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s {newest}'
+            f') ORDER BY score, rowid DESC LIMIT %s OFFSET %s',
+            [TITLE_WEIGHT, BODY_WEIGHT, *params, limit, offset],
+        )
+        rows = cursor.fetchall()
+    ids = [pk for pk, _ in rows]
+    documents = SearchDocument.objects.in_bulk(ids)
+    return [documents[pk] for pk in ids if pk in documents], bool(cap and rows and rows[0][1] >= cap)
+
+
+def _fallback(text, offset, limit):
+    matches = Q()
+    for term in text.split():
+        matches &= Q(title__icontains=term) | Q(body__icontains=term)
+    return list(SearchDocument.objects.filter(matches).order_by('-pk')[offset:offset + limit])
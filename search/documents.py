@@ -0,0 +1,100 @@
+"""What each indexed model contributes to the search index."""
+
+from django.urls import reverse
+from classmeet.models import Course, CourseMaterial
+from discussions.models import Comment, Discussion
+from .models import SearchDocument
+
+
+def _discussion(discussion):
+    return {
+        'title': discussion.title,
+        'body': discussion.description,
+        'context': '',
+        'url': reverse('discussion_detail', args=[discussion.pk]),
+    }
+
+
+def _comment(comment):
+    # The discussion title is shown with the result but not indexed, so a
+    # thread's title doesn't make every comment in it a match
+    return {
+        'title': '',
+        'body': comment.text,
+        'context': comment.discussion.title,
+        'url': reverse('discussion_detail', args=[comment.discussion_id]),
+    }
+
+
+def _course(course):
+    return {
+        'title': course.title,
+        'body': course.description,
+        'context': '',
+        'url': reverse('course_detail', args=[course.pk]),
+    }
+
+
+def _material(material):
+    return {
+        'title': material.title,
+        'body': '',
+        'context': material.course.title,
+        'url': reverse('course_detail', args=[material.course_id]),
+    }
+
+
+# Model -> (document kind, builder, related objects the builder reads)
+INDEXED_MODELS = {
+    Discussion: (SearchDocument.DISCUSSION, _discussion, []),
+    Comment: (SearchDocument.COMMENT, _comment, ['discussion']),
+    Course: (SearchDocument.COURSE, _course, []),
+    CourseMaterial: (SearchDocument.MATERIAL, _material, ['course']),
+}
+
+
+# Model -> (kind, model and foreign key of the documents showing its title as context)
+CONTEXT_OF = {
+    Discussion: (SearchDocument.COMMENT, Comment, 'discussion'),
+    Course: (SearchDocument.MATERIAL, CourseMaterial, 'course'),
+}
+
+
+def index_object(instance):
+    kind, build, _ = INDEXED_MODELS[type(instance)]
+    fields = build(instance)
+    # One upsert instead of update_or_create's locked read and write
+    SearchDocument.objects.bulk_create(
+        [SearchDocument(kind=kind, object_id=instance.pk, **fields)],
+        update_conflicts=True, unique_fields=['kind', 'object_id'], update_fields=[*fields, 'updated_at'],
+    )
+
+
+def unindex_object(model, pk):
+    kind = INDEXED_MODELS[model][0]
+    SearchDocument.objects.filter(kind=kind, object_id=pk).delete()
+
+
+def update_context(instance):
+    """Show ``instance``'s current title on its comments' or materials' documents."""
+    kind, model, field = CONTEXT_OF[type(instance)]
+    SearchDocument.objects.filter(
+        kind=kind, object_id__in=model.objects.filter(**{field: instance}).values('pk'),
+    ).update(context=instance.title)
+
+
+def rebuild_index(batch_size=1000):
+    """Replace the whole index from the source tables; returns the number of documents."""
+    SearchDocument.objects.all().delete()
+    total = 0
+    for model, (kind, build, related) in INDEXED_MODELS.items():
+        batch = []
+        for instance in model.objects.select_related(*related).iterator(chunk_size=batch_size):
+            batch.append(SearchDocument(kind=kind, object_id=instance.pk, **build(instance)))
+            if len(batch) >= batch_size:
+                SearchDocument.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+        total += len(batch)
+    return total
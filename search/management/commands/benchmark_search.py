@@ -0,0 +1,70 @@
+import random
+import time
+from itertools import accumulate, islice
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from meetings.loadtest import percentile
+from search.backends import search
+from search.models import SearchDocument
+
+COMMON_WORDS = (
+    'question answer homework lecture exam assignment project deadline review summary '
+    'algebra biology chemistry derivative enzyme geometry history integral matrix vector'
+).split()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure search latency (p50/p99) over synthetic documents. All rows are rolled back afterwards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=1000000)
+        parser.add_argument('--vocabulary', type=int, default=50000,
+                            help='Distinct words; their frequencies follow Zipf\'s law like real text')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 5], help='Result pages to time')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        words = COMMON_WORDS + [f'word{i}' for i in range(options['vocabulary'] - len(COMMON_WORDS))]
+        weights = list(accumulate(1 / rank for rank in range(1, len(words) + 1)))
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                documents = (
+                    SearchDocument(
+                        kind=SearchDocument.COMMENT, object_id=10 ** 12 + i, url='/',
+                        title=' '.join(rng.choices(words, cum_weights=weights, k=6)),
+                        body=' '.join(rng.choices(words, cum_weights=weights, k=40)),
+                    )
+                    for i in range(options['documents'])
+                )
+                while batch := list(islice(documents, 5000)):
+                    SearchDocument.objects.bulk_create(batch)
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE search_searchdocument')
+                self.stdout.write(
+                    f'{SearchDocument.objects.count()} documents indexed in {time.perf_counter() - started:.0f}s'
+                )
+                queries = [' '.join(rng.choices(words, cum_weights=weights, k=rng.randint(1, 3))) for _ in range(options['queries'])]
+                for page in options['pages']:
+                    self._run(queries, page)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, queries, page):
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            len(search(query, page))
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        self.stdout.write(
+            f'page={page:>3} queries={len(queries):>5} p50={percentile(latencies, 50) * 1000:7.2f} ms '
+            f'p99={percentile(latencies, 99) * 1000:7.2f} ms max={latencies[-1] * 1000:7.2f} ms'
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from search.documents import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the search index from discussions, comments, courses and materials. '
+        'Saves keep it current afterwards; run this once after installing search.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(f'Indexed {total} documents.')
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:51
+
+from django.db import migrations, models
+
+POSTGRES_INDEX = [
+    """ALTER TABLE search_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'B')
+    ) STORED""",
+    'CREATE INDEX search_document_vector_idx ON search_searchdocument USING gin (search_vector)',
+]
+
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS search_document_vector_idx',
+    'ALTER TABLE search_searchdocument DROP COLUMN IF EXISTS search_vector',
+]
+
+# External-content FTS5 table: it stores only the index and reads text from
+# search_searchdocument, with triggers keeping the two in step
+SQLITE_INDEX = [
+    """CREATE VIRTUAL TABLE search_searchdocument_fts USING fts5(
+        title, body, content='search_searchdocument', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER search_searchdocument_ai AFTER INSERT ON search_searchdocument BEGIN
+        INSERT INTO search_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER search_searchdocument_ad AFTER DELETE ON search_searchdocument BEGIN
+        INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER search_searchdocument_au AFTER UPDATE ON search_searchdocument BEGIN
+        INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO search_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS search_searchdocument_ai',
+    'DROP TRIGGER IF EXISTS search_searchdocument_ad',
+    'DROP TRIGGER IF EXISTS search_searchdocument_au',
+    'DROP TABLE IF EXISTS search_searchdocument_fts',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+create_full_text_index = _run({'postgresql': POSTGRES_INDEX, 'sqlite': SQLITE_INDEX})
+drop_full_text_index = _run({'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP})
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('discussion', 'Discussion'), ('comment', 'Comment'), ('course', 'Course'), ('material', 'Material')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('context', models.CharField(blank=True, max_length=255)),
+                ('url', models.CharField(max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='search_document_object_unique')],
+            },
+        ),
+        migrations.RunPython(create_full_text_index, drop_full_text_index),
+    ]
@@ -0,0 +1,39 @@
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """A searchable object, copied into one table the full-text index covers.
+
+    ``title`` is weighted above ``body`` in ranking. ``context`` (the
+    discussion or course an item belongs to) and ``url`` are only shown with
+    results. The index itself is created by the migration for the database in
+    use: a generated ``tsvector`` column with a GIN index on PostgreSQL, an
+    FTS5 table kept in step by triggers on SQLite (see search.backends).
+    """
+
+    DISCUSSION = 'discussion'
+    COMMENT = 'comment'
+    COURSE = 'course'
+    MATERIAL = 'material'
+    KIND_CHOICES = [
+        (DISCUSSION, 'Discussion'),
+        (COMMENT, 'Comment'),
+        (COURSE, 'Course'),
+        (MATERIAL, 'Material'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    context = models.CharField(max_length=255, blank=True)
+    url = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.get_kind_display()}: {self.title or self.body[:50]}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='search_document_object_unique'),
+        ]
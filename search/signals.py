@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .documents import CONTEXT_OF, INDEXED_MODELS, index_object, unindex_object, update_context
+
+
+@receiver(pre_save)
+def object_saving(sender, instance, **kwargs):
+    # Remember the title other documents show, to refresh them only when it changes
+    if sender in CONTEXT_OF:
+        instance._previous_title = None
+        if instance.pk:
+            instance._previous_title = sender.objects.filter(pk=instance.pk).values_list('title', flat=True).first()
+
+
+@receiver(post_save)
+def object_saved(sender, instance, created=False, **kwargs):
+    if sender not in INDEXED_MODELS:
+        return
+    index_object(instance)
+    if sender in CONTEXT_OF and not created and instance.title != instance._previous_title:
+        update_context(instance)
+
+
+@receiver(post_delete)
+def object_deleted(sender, instance, **kwargs):
+    if sender in INDEXED_MODELS:
+        unindex_object(sender, instance.pk)
@@ -0,0 +1,142 @@
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from classmeet.models import Course, CourseMaterial
+from discussions.models import Comment, Discussion
+from .backends import search
+from .models import SearchDocument
+
+
+class IndexingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.discussion = Discussion.objects.create(
+            title='Eigenvalues', description='How do I find them?', author=self.user,
+        )
+
+    def document(self, kind, object_id):
+        return SearchDocument.objects.get(kind=kind, object_id=object_id)
+
+    def test_saves_are_indexed(self):
+        comment = Comment.objects.create(discussion=self.discussion, author=self.user, text='Use the determinant')
+        document = self.document(SearchDocument.COMMENT, comment.pk)
+        self.assertEqual((document.title, document.body, document.context), ('', 'Use the determinant', 'Eigenvalues'))
+        self.assertEqual(document.url, reverse('discussion_detail', args=[self.discussion.pk]))
+
+        self.discussion.title = 'Eigenvectors'
+        self.discussion.save()
+        self.assertEqual(self.document(SearchDocument.DISCUSSION, self.discussion.pk).title, 'Eigenvectors')
+
+    def test_deletes_are_unindexed(self):
+        Comment.objects.create(discussion=self.discussion, author=self.user, text='Use the determinant')
+        self.discussion.delete()
+        self.assertFalse(SearchDocument.objects.exists())
+
+    def test_course_rename_updates_material_context(self):
+        course = Course.objects.create(title='Linear algebra', description='Matrices', teacher=self.user)
+        materials = [
+            CourseMaterial.objects.create(course=course, title=f'Slides {i}', file=f'course_materials/{i}.pdf')
+            for i in range(3)
+        ]
+        course.title = 'Linear algebra II'
+        course.save()
+        for material in materials:
+            self.assertEqual(self.document(SearchDocument.MATERIAL, material.pk).context, 'Linear algebra II')
+
+    def test_discussion_rename_updates_comment_context(self):
+        comments = [
+            Comment.objects.create(discussion=self.discussion, author=self.user, text=f'Reply {i}') for i in range(3)
+        ]
+        other = Discussion.objects.create(title='Other', description='text', author=self.user)
+        elsewhere = Comment.objects.create(discussion=other, author=self.user, text='Reply')
+        self.discussion.title = 'Eigenvectors'
+        # Previous title, the discussion's own document, and every comment's context in one UPDATE
+        with self.assertNumQueries(4):
+            self.discussion.save()
+        for comment in comments:
+            self.assertEqual(self.document(SearchDocument.COMMENT, comment.pk).context, 'Eigenvectors')
+        self.assertEqual(self.document(SearchDocument.COMMENT, elsewhere.pk).context, 'Other')
+
+    def test_unchanged_title_leaves_context_alone(self):
+        Comment.objects.create(discussion=self.discussion, author=self.user, text='Reply')
+        self.discussion.description = 'Edited'
+        with self.assertNumQueries(3):
+            self.discussion.save()
+
+    def test_rebuild_replaces_index(self):
+        SearchDocument.objects.all().delete()
+        SearchDocument.objects.create(kind=SearchDocument.COMMENT, object_id=999, url='/')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(
+            list(SearchDocument.objects.values_list('kind', 'object_id')),
+            [(SearchDocument.DISCUSSION, self.discussion.pk)],
+        )
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        cls.in_body = Discussion.objects.create(
+            title='Homework help', description='Stuck on photosynthesis questions', author=author,
+        )
+        cls.in_title = Discussion.objects.create(
+            title='Photosynthesis', description='Light reactions', author=author,
+        )
+
+    def test_title_matches_rank_first(self):
+        results = search('photosynthesis')
+        self.assertEqual([document.object_id for document in results], [self.in_title.pk, self.in_body.pk])
+
+    def test_all_words_must_match(self):
+        self.assertEqual([document.object_id for document in search('photosynthesis light')], [self.in_title.pk])
+        self.assertEqual(len(search('photosynthesis chlorophyll')), 0)
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(len(search('"photosynthesis: (*')), 2)
+        self.assertEqual(len(search('title: OR NEAR(')), 0)
+        self.assertEqual(len(search('  ')), 0)
+
+    def test_stemming(self):
+        self.assertEqual([document.object_id for document in search('reaction')], [self.in_title.pk])
+
+    def test_pages(self):
+        first = search('photosynthesis', per_page=1)
+        second = search('photosynthesis', page=2, per_page=1)
+        self.assertTrue(first.has_next)
+        self.assertFalse(second.has_next)
+        self.assertTrue(second.has_previous)
+        self.assertEqual([document.object_id for document in second], [self.in_body.pk])
+
+    def test_only_newest_candidates_are_ranked(self):
+        newest = Discussion.objects.create(
+            title='Exam', description='Photosynthesis again', author=self.in_body.author,
+        )
+        with self.settings(SEARCH_MAX_CANDIDATES=2):
+            results = search('photosynthesis')
+        # The oldest match is left out of the ranking, and the page says so
+        self.assertEqual([document.object_id for document in results], [self.in_title.pk, newest.pk])
+        self.assertTrue(results.truncated)
+        self.assertFalse(search('photosynthesis').truncated)
+        with self.settings(SEARCH_MAX_CANDIDATES=0):
+            results = search('photosynthesis')
+        self.assertEqual([document.object_id for document in results][0], self.in_title.pk)
+        self.assertEqual(len(results), 3)
+        self.assertFalse(results.truncated)
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('search'), {'q': 'photosynthesis', 'page': 'x'})
+        self.assertContains(response, reverse('discussion_detail', args=[self.in_title.pk]))
+        self.assertContains(response, reverse('discussion_detail', args=[self.in_body.pk]))
+        self.assertNotContains(response, 'Only the most recent matches')
+        with self.settings(SEARCH_MAX_CANDIDATES=1):
+            response = self.client.get(reverse('search'), {'q': 'photosynthesis'})
+        self.assertContains(response, 'Only the most recent matches')
+
+    def test_view_requires_login(self):
+        response = self.client.get(reverse('search'), {'q': 'photosynthesis'})
+        self.assertEqual(response.status_code, 302)
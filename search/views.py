@@ -0,0 +1,14 @@
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+from .backends import search as search_documents
+
+
+@login_required
+def search(request):
+    query = request.GET.get('q', '')[:200]
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    results = search_documents(query, page)
+    return render(request, 'search/results.html', {'query': query, 'results': results})